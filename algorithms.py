@@ -1,22 +1,149 @@
 import copy
+import multiprocessing
 import time
 import sys
+from collections import deque
+
+from batch_heuristics import CellTableBatch, PlayerDistanceBatch, cell_table, np
+from deadlock import RULES, DeadlockDetector, simple_dead_squares
+from decomposition import solve_decomposed
+from frontier import TimedFrontier
+from hda_star import run_hda_star
+from incremental import CellTableHeuristic, CombinedHeuristic, FreedomDegreesHeuristic
+from matching import MATCHING_MAX_BOXES, min_cost_matching
+from lurd import from_lurd, to_lurd
+from metrics import SAMPLE_EVERY, Profiling, SearchMetrics, profile_modes
+from pattern_db import PATTERN_MAX_BOXES, PATTERN_SIZE, load_pattern_database
+from sma_star import SmaMemory
+from solution_cache import is_optimal, replay, solution_key
+from sokoban import Sokoban
+from state import UNREACHABLE, SearchState, StaticMap, goal_roots
+from transposition import TranspositionTable
+
+
+ALGORITHMS = ["bfs", "dfs", "iddfs", "local_greedy", "global_greedy", "a_star", "anytime_a_star", "hda_star",
+              "ida_star", "sma_star", "bidirectional"]
+HEURISTICS = ["manhattan_boxes", "manhattan_player", "freedom_degrees", "combined", "grid", "matching", "pattern_db",
+              "pattern_db_max"]
+# Algorithms that only make sense over box pushes and always run in "pushes" mode
+PUSH_ALGORITHMS = ["bidirectional"]
+# Algorithms whose search (and so whose solution) depends on max_depth
+DEPTH_BOUNDED_ALGORITHMS = ["iddfs"]
+INFORMED_ALGORITHMS = ["local_greedy", "global_greedy", "a_star", "anytime_a_star", "hda_star", "ida_star",
+                       "sma_star"]
+# Transposition table entries for IDA* when no memory budget is given
+IDA_STAR_TABLE_SIZE = 1000000
+# Longest cancel reason an EventCancellation carries across processes
+CANCEL_REASON_BYTES = 64
+# Weights of anytime_a_star: a quick first solution, then tighter searches down to plain A*
+ANYTIME_WEIGHTS = [2.0, 1.5, 1.25, 1.0]
+
+
+class SearchLimitReached(Exception):
+    def __init__(self, reason, nodes):
+        super().__init__(f"{reason} reached after {nodes} nodes")
+        self.reason = reason
+        self.nodes = nodes
+
+
+class Cancellation:
+    """Cooperative stop flag for a running solve(), checked on every expansion.
+
+    cancel() can be called from any thread; the search then stops with the given
+    reason as its status, keeping the best solution an anytime search has found.
+    """
+
+    def __init__(self):
+        self.reason = None
+
+    def cancel(self, reason="cancelled"):
+        if self.reason is None:
+            self.reason = reason
+
+    @property
+    def cancelled(self):
+        return self.reason is not None
+
+
+class EventCancellation(Cancellation):
+    """Cancellation shared with worker processes, passed to them when they start.
+
+    A multiprocessing Event and a shared byte array hold the flag and the reason, so
+    cancel() in any process stops the solvers of all of them with that reason.
+    """
+
+    def __init__(self, context=None):
+        context = context or multiprocessing.get_context()
+        self.event = context.Event()
+        self._reason = context.Array("c", CANCEL_REASON_BYTES)
+
+    def cancel(self, reason="cancelled"):
+        with self._reason.get_lock():
+            if not self.event.is_set():
+                self._reason.value = reason.encode()[:CANCEL_REASON_BYTES]
+                self.event.set()
+
+    @property
+    def reason(self):
+        return self._reason.value.decode() if self.event.is_set() else None
+
+
+class SearchResult:
+    def __init__(self, algorithm_name, heuristic_name, mode):
+        self.algorithm = algorithm_name
+        self.heuristic = heuristic_name
+        self.mode = mode
+        # "solved", "no_solution", "node_limit", "time_limit", "memory_limit" or the reason of a Cancellation
+        self.status = "no_solution"
+        self.node = None
+        self.nodes = 0
+        self.frontier = 0
+        self.cost = 0
+        self.moves = []
+        self.pushes = 0
+        self.time = 0.0
+        self.generated = 0
+        self.deduplicated = 0
+        self.reopened = 0
+        self.pruned = {}
+        self.metrics = None
+        self.cached = False  # True when the solution came from a SolutionCache
+        # Anytime searches: the limit that stopped the search after it had found a solution, and the proven
+        # factor between the solution's cost and the optimal one (1.0 once the search has finished)
+        self.limit = None
+        self.bound = None
+        # Number of independent groups searched separately when the level was decomposed, and whether the
+        # moves are their stitched solutions (False when the whole-level search that followed found them)
+        self.subproblems = None
+        self.stitched = False
+
+    @property
+    def solved(self):
+        return self.status == "solved"
 
 
 class SokobanSolver:
+    Direction = Sokoban.Direction
+
     class TreeNode:
+        __slots__ = ("state", "parent", "action", "depth", "h_cache")
+
         def __init__(self, state, parent=None, action=None, depth=0):  # Add depth parameter with default value
             self.state = state
             self.parent = parent
             self.action = action
             self.depth = depth  # Store the depth of the node
+            self.h_cache = None  # Aggregate kept by incremental heuristics
 
     def _grid_notation(self, state):
+        # Manhattan distance of each cell to its nearest goal; walls and corners that are not goals are
+        # UNREACHABLE, as a box pushed into such a corner can never leave it
+        goals = state.get_goals()
         matrix = []
         for j, row in enumerate(state.get_level_state()):
             new_row = []
             for i, elem in enumerate(row):
-                if elem == state.Icons.WALL or (
+                if elem == state.Icons.WALL or ((i, j) not in goals and (
                         (state.get_cell_content(i, j - 1) == state.Icons.WALL and state.get_cell_content(i - 1,
                                                                                                          j) == state.Icons.WALL) or
                         (state.get_cell_content(i, j - 1) == state.Icons.WALL and state.get_cell_content(i + 1,
@@ -25,37 +152,149 @@ class SokobanSolver:
                                                                                                          j) == state.Icons.WALL) or
                         (state.get_cell_content(i, j + 1) == state.Icons.WALL and state.get_cell_content(i + 1,
                                                                                                          j) == state.Icons.WALL)
-                ):
-                    new_row.append(sys.maxsize)
+                )):
+                    new_row.append(UNREACHABLE)
                 else:
-                    value = min([self._manhattan_distance((i, j), goal) for goal in state.get_goals()])
+                    value = min([self._manhattan_distance((i, j), goal) for goal in goals])
                     new_row.append(value)
             matrix.append(new_row)
         return matrix
 
-    def __init__(self, initial_sokoban):
-        self.initial_node = self.TreeNode(initial_sokoban)
-        self.grid = self._grid_notation(self.initial_node.state)
+    def __init__(self, initial_sokoban, cache=None):
+        # Kept aside to replay and check solutions that are stitched together
+        self.initial_sokoban = copy.deepcopy(initial_sokoban)
+        # Walls and goals are stored once; every node only carries the player and the boxes
+        self.static_map = StaticMap(initial_sokoban)
+        self.initial_node = self.TreeNode(SearchState.from_sokoban(initial_sokoban, self.static_map))
+        # Optional SolutionCache: per-level tables are loaded from it and solutions are looked up and stored
+        self.cache = cache
+        if cache is None:
+            self.grid = self._grid_notation(initial_sokoban)
+        else:
+            self._load_tables(cache.tables(self.static_map, lambda: self._build_tables(initial_sokoban)))
+        self.dedup = True
+        self.closed_set = None
+        # "moves": actions are unit player moves; "pushes": actions are box pushes (macro moves)
+        self.mode = "moves"
+        self.deadlocks = DeadlockDetector(self.static_map)
+        self.incremental = True
+        self._incremental_heuristics = None
+        # Boxes per pattern of the pattern_db heuristics; the table is loaded (or built) on first use
+        self.pattern_size = PATTERN_SIZE
+        self._pattern_database = None
+        # Large expansions are evaluated in one NumPy call when it is installed (see BatchHeuristic.min_cells)
+        self.batch = np is not None
+        self._batch_heuristics = None
+        # Search budget, checked on every expansion
+        self.expanded = 0
+        self.max_nodes = None
+        self.deadline = None
+        self.memory_limit = None
+        self.cancel = None
+        self.metrics = SearchMetrics()
+        # Best solution of the running anytime search as (node, nodes expanded, bound), and the callback
+        # told about each improvement
+        self.incumbent = None
+        self.on_solution = None
+        self._result = None
+        # Set once sma_star forgets a node: its solution may then not be the cheapest
+        self.memory_bounded = False
+
+    def _build_tables(self, sokoban):
+        return {
+            "grid": self._grid_notation(sokoban),
+            "goal_distances": self.static_map.goal_distances(),
+            "dead_squares": sorted(simple_dead_squares(self.static_map)),
+        }
+
+    def _load_tables(self, tables):
+        self.grid = tables["grid"]
+        self.static_map.load_goal_distances(tables["goal_distances"])
+        self.static_map.dead_squares = frozenset(tuple(cell) for cell in tables["dead_squares"])
+
+    def _cached_result(self, result, key):
+        entry = self.cache.get_solution(self.initial_sokoban, key)
+        if entry is None:
+            return False
+        # The search statistics are those of the run that found the solution
+        result.status = "solved"
+        result.cached = True
+        result.moves = from_lurd(entry["lurd"])
+        for name in ["cost", "pushes", "nodes", "frontier", "generated", "deduplicated", "reopened", "pruned"]:
+            setattr(result, name, entry[name])
+        result.bound = entry.get("bound")
+        result.subproblems = entry.get("subproblems")
+        result.stitched = entry.get("stitched", False)
+        return True
+
+    def _cacheable(self, result):
+        # A solution cut short by a limit, found by an SMA* that had to forget nodes (max_memory is not part
+        # of the cache key), or by an anytime search not proven optimal, may not be the one a full run finds
+        return result.limit is None and not self.memory_bounded and result.bound in [None, 1.0]
+
+    def _cache_result(self, result, key, heuristic_name):
+        # heuristic_name is the one in the key: None for searches that do not use a heuristic
+        self.cache.put_solution(self.initial_sokoban, key, {
+            "lurd": to_lurd(self.initial_node.state, result.moves),
+            "algorithm": result.algorithm,
+            "heuristic": result.heuristic,
+            "mode": result.mode,
+            # Stitched group solutions are not proven cheapest for the whole level
+            "optimal": {cost: result.mode == cost and not result.stitched
+                        and is_optimal(result.algorithm, heuristic_name) for cost in ["moves", "pushes"]},
+            "moves": len(result.moves),
+            "pushes": result.pushes,
+            "cost": result.cost,
+            "nodes": result.nodes,
+            "frontier": result.frontier,
+            "generated": result.generated,
+            "deduplicated": result.deduplicated,
+            "reopened": result.reopened,
+            "pruned": result.pruned,
+            "time": result.time,
+            "bound": result.bound,
+            "subproblems": result.subproblems,
+            "stitched": result.stitched,
+        })
+
+    def _state_key(self, state):
+        # Unit moves keep the exact player cell in the key: folding the player's reachable region
+        # would drop the walking moves needed to reach the next push
+        return state.canonical_key() if self.mode == "pushes" else state.key()
+
+    def _new_closed_set(self, reopen=False, max_entries=None):
+        self.closed_set = TranspositionTable(self._state_key, enabled=self.dedup, reopen=reopen,
+                                             max_entries=max_entries)
+        self.closed_set.admit(self.initial_node.state, 0)
+        return self.closed_set
+
+    def _new_frontier(self):
+        return TimedFrontier(self.metrics.timings)
+
+    def _expand_new(self, node, closed):
+        return [child for child in self._expand(node) if closed.admit(child.state, child.depth)]
 
     def _bfs(self):
-        frontier = [self.initial_node]
+        closed = self._new_closed_set()
+        frontier = deque([self.initial_node])
+        self.metrics.watch(frontier)
         node_counter = 0
 
         while frontier:
-            node = frontier.pop(0)
+            node = frontier.popleft()
             node_counter += 1
 
             if self._goal_test(node.state):
                 return node, node_counter, len(frontier), node.depth
 
-            for action in self._actions_fn(node.state):
-                new_state = self._apply_action(node.state, action)
-                frontier.append(self.TreeNode(new_state, node, action, node.depth + 1))
+            frontier.extend(self._expand_new(node, closed))
 
         return None, node_counter, len(frontier), 0
 
     def _dfs(self):
+        closed = self._new_closed_set()
         frontier = [self.initial_node]
+        self.metrics.watch(frontier)
         node_counter = 0  # Initialize the counter
 
         while frontier:
@@ -65,115 +304,527 @@ class SokobanSolver:
             if self._goal_test(node.state):
                 return node, node_counter, len(frontier), node.depth
 
-            for action in self._actions_fn(node.state):
-                new_state = self._apply_action(node.state, action)
-                frontier.append(self.TreeNode(new_state, node, action, node.depth + 1))
+            frontier.extend(self._expand_new(node, closed))
         return None, node_counter, len(frontier), 0  # If goal not found
 
-    def _dls(self, node, depth, max_depth, node_counter):
-        if depth > max_depth:
-            return None, node_counter, node.depth
-        if self._goal_test(node.state):
-            return node, node_counter, node.depth
-        if depth == 0:
-            return 'cutoff', node_counter, node.depth
-        for action in self._actions_fn(node.state):
-            new_state = self._apply_action(node.state, action)
-            child, node_counter = self._dls(self.TreeNode(new_state, node, action, node.depth + 1), depth - 1,
-                                            max_depth, node_counter)
-            if child == 'cutoff':
-                return 'cutoff', node_counter, node.depth
-            elif child is not None:
-                return child, node_counter, node.depth
-        return None, node_counter, node.depth
+    def _dls(self, limit, node_counter):
+        # Depth-limited DFS with an explicit stack; states already on the current path are skipped
+        root = self.initial_node
+        node_counter += 1
+        if self._goal_test(root.state):
+            return root, node_counter
+        if limit == 0:
+            return 'cutoff', node_counter
+
+        cutoff = False
+        on_path = {self._state_key(root.state)}
+        stack = [(root, iter(self._expand(root)))]
+        self.metrics.watch(stack)
+        while stack:
+            node, children = stack[-1]
+            child = next(children, None)
+            if child is None:
+                stack.pop()
+                on_path.discard(self._state_key(node.state))
+                continue
+            key = self._state_key(child.state)
+            if key in on_path:
+                continue
+            node_counter += 1
+            if self._goal_test(child.state):
+                return child, node_counter
+            if child.depth >= limit:
+                cutoff = True
+                continue
+            on_path.add(key)
+            stack.append((child, iter(self._expand(child))))
+        return ('cutoff' if cutoff else None), node_counter
 
     def _iddfs(self, max_depth):
         node_counter = 0
         for depth in range(max_depth + 1):
-            result, node_counter = self._dls(self.initial_node, depth, max_depth, node_counter)
+            result, node_counter = self._dls(depth, node_counter)
             if result != 'cutoff':
-                return result, node_counter
-        return None, node_counter
+                return result, node_counter, result.depth if result else 0
+        return None, node_counter, 0
 
     def _local_greedy(self, node_counter, heuristic_fn):
-        def h(node):
-            return heuristic_fn(node.state)
+        # Depth-first, always trying the child with the lowest heuristic first
+        node_h = self._node_heuristic(heuristic_fn)
+        nodes_h = self._nodes_heuristic(heuristic_fn)
+        closed = self._new_closed_set()
+        node_h(self.initial_node)
+        stack = [self.initial_node]
+        self.metrics.watch(stack)
+
+        while stack:
+            node = stack.pop()
+            node_counter += 1
 
-        def recursive_local_greedy(node, node_counter):
             if self._goal_test(node.state):
                 return node, node_counter, node.depth
 
-            frontier = []
-            for action in self._actions_fn(node.state):
-                new_state = self._apply_action(node.state, action)
-                new_node = self.TreeNode(new_state, node, action, node.depth + 1)
-                frontier.append(new_node)
+            # Reversed so the best child (the first one on ties) is popped next
+            children = self._expand_new(node, closed)
+            ranked = sorted(zip(nodes_h(children), range(len(children))))
+            stack.extend(children[i] for _, i in reversed(ranked))
 
-            while frontier:
-                node = min(frontier, key=h)
-                frontier.remove(node)
-                child, node_counter = recursive_local_greedy(node, node_counter)
-                if child is not None:
-                    return child, node_counter, node.depth
-            return None, node_counter, node.depth
-
-        return recursive_local_greedy(self.initial_node, node_counter)
+        return None, node_counter, 0
 
     def _global_greedy(self, heuristic_fn):
-        def h(node):
-            return heuristic_fn(node.state)
-
-        frontier = [self.initial_node]
+        node_h = self._node_heuristic(heuristic_fn)
+        nodes_h = self._nodes_heuristic(heuristic_fn)
+        closed = self._new_closed_set()
+        frontier = self._new_frontier()
+        self.metrics.watch(frontier)
+        h = node_h(self.initial_node)
+        frontier.push(self.initial_node, h, h)
         node_counter = 0
 
         while frontier:
-            node = min(frontier, key=h)
-            frontier.remove(node)
+            node = frontier.pop()
             node_counter += 1
 
             if self._goal_test(node.state):
                 return node, node_counter, len(frontier), node.depth
 
-            for action in self._actions_fn(node.state):
-                new_state = self._apply_action(node.state, action)
-                new_node = self.TreeNode(new_state, node, action, node.depth + 1)
-                frontier.append(new_node)
+            children = self._expand_new(node, closed)
+            for child, h in zip(children, nodes_h(children)):
+                frontier.push(child, h, h)
 
         return None, node_counter, len(frontier), 0
 
     def _a_star(self, heuristic_fn):
-        def f(node):
-            return node.depth + heuristic_fn(node.state)
-
-        frontier = [self.initial_node]
+        node_h = self._node_heuristic(heuristic_fn)
+        nodes_h = self._nodes_heuristic(heuristic_fn)
+        closed = self._new_closed_set(reopen=True)
+        frontier = self._new_frontier()
+        self.metrics.watch(frontier)
+        h = node_h(self.initial_node)
+        frontier.push(self.initial_node, self.initial_node.depth + h, h)
         node_counter = 0
 
         while frontier:
-            node = min(frontier, key=f)
-            frontier.remove(node)
+            node = frontier.pop()
+            # Lazy deletion: a cheaper path to this state was queued after this entry
+            if closed.is_stale(node.state, node.depth):
+                continue
             node_counter += 1
 
             if self._goal_test(node.state):
                 return node, node_counter, len(frontier), node.depth
 
-            for action in self._actions_fn(node.state):
-                new_state = self._apply_action(node.state, action)
-                new_node = self.TreeNode(new_state, node, action, node.depth + 1)
-                new_node.depth = node.depth + 1
-                frontier.append(new_node)
+            children = self._expand_new(node, closed)
+            for child, h in zip(children, nodes_h(children)):
+                frontier.push(child, child.depth + h, h)
 
         return None, node_counter, len(frontier), 0
 
+    def _anytime_a_star(self, heuristic_fn, weights):
+        # Weighted A* (f = g + w * h) run with decreasing weights over one frontier and closed set. Each
+        # cheaper solution is kept as the incumbent, then the frontier is reordered for the next weight;
+        # nodes that cannot beat the incumbent (g + h >= its cost) are dropped, so an exhausted frontier
+        # proves it optimal for an admissible heuristic
+        node_h = self._node_heuristic(heuristic_fn)
+        nodes_h = self._nodes_heuristic(heuristic_fn)
+        closed = self._new_closed_set(reopen=True)
+        frontier = self._new_frontier()
+        self.metrics.watch(frontier)
+        h = node_h(self.initial_node)
+        frontier.push(self.initial_node, self.initial_node.depth + weights[0] * h, h)
+        best_cost = UNREACHABLE
+        node_counter = 0
+
+        for weight in weights:
+            frontier.reprioritize(lambda node, h: node.depth + weight * h)
+            while frontier:
+                node, h = frontier.pop_entry()
+                if node.depth + h >= best_cost or closed.is_stale(node.state, node.depth):
+                    continue
+                node_counter += 1
+
+                if self._goal_test(node.state):
+                    best_cost = node.depth
+                    self._improved(node, node_counter, min(weight, self._anytime_bound(best_cost, frontier)))
+                    break
+
+                children = self._expand_new(node, closed)
+                for child, h in zip(children, nodes_h(children)):
+                    if child.depth + h < best_cost:
+                        frontier.push(child, child.depth + weight * h, h)
+            else:
+                break
+
+        if self.incumbent is None:
+            return None, node_counter, len(frontier), 0
+        node = self.incumbent[0]
+        self.incumbent = (node, node_counter, 1.0 if not frontier else self._anytime_bound(best_cost, frontier))
+        return node, node_counter, len(frontier), node.depth
+
+    def _anytime_bound(self, cost, frontier):
+        # Every cheaper solution goes through a queued node, so the lowest g + h queued bounds the optimal cost
+        lowest = min([node.depth + h for node, h in frontier.entries()], default=cost)
+        return cost / lowest if 0 < lowest < cost else 1.0
+
+    def _improved(self, node, node_counter, bound):
+        self.incumbent = (node, node_counter, bound)
+        if self.on_solution is not None:
+            result = SearchResult(self._result.algorithm, self._result.heuristic, self.mode)
+            result.nodes = node_counter
+            result.bound = bound
+            result.time = self.metrics.elapsed()
+            self._set_solution(result, node)
+            self.on_solution(result)
+
+    def _hda_star(self, heuristic_name, workers):
+        # A* split over worker processes by state key; the solution comes back as a list of actions
+        # and is rebuilt here as a chain of nodes
+        search = run_hda_star(self.initial_sokoban, self._state_key(self.initial_node.state),
+                              self.initial_node.state.player, self.mode, heuristic_name,
+                              sorted(self.deadlocks.rules), workers, self.max_nodes, self.deadline,
+                              self.memory_limit, self.cancel)
+        self.closed_set = TranspositionTable(self._state_key)
+        self.closed_set.generated = self.metrics.generated = search.generated
+        self.closed_set.duplicates = search.duplicates
+        self.closed_set.reopened = search.reopened
+        for rule, count in search.pruned.items():
+            self.deadlocks.pruned[rule] += count
+        # The workers' own timings stay in their processes; only the node counts come back
+        self.metrics.expanded = search.expanded
+        self.metrics.peak_frontier = max(self.metrics.peak_frontier, search.frontier)
+        if search.status not in ["solved", "no_solution"]:
+            raise SearchLimitReached(search.status, search.expanded)
+        if search.actions is None:
+            return None, search.expanded, search.frontier, 0
+        node = self.initial_node
+        for action in search.actions:
+            node = self.TreeNode(self._apply_action(node.state, action), node, action, node.depth + 1)
+        return node, search.expanded, search.frontier, node.depth
+
+    def _ida_star(self, heuristic_fn, table_size):
+        # Iterative deepening on f = g + h with an explicit stack. Within one iteration a bounded
+        # transposition table drops states already reached at an equal or lower g.
+        node_h = self._node_heuristic(heuristic_fn)
+        closed = self._new_closed_set(reopen=True, max_entries=table_size)
+        root = self.initial_node
+        root_h = node_h(root)
+        bound = root.depth + root_h
+        node_counter = 0
+
+        # Dead states have an UNREACHABLE h, so they never set the next bound
+        while bound < UNREACHABLE:
+            closed.clear()
+            closed.admit(root.state, root.depth)
+            next_bound = UNREACHABLE
+            stack = [(root, root_h)]
+            self.metrics.watch(stack)
+            while stack:
+                node, h = stack.pop()
+                f = node.depth + h
+                if f > bound:
+                    next_bound = min(next_bound, f)
+                    continue
+                node_counter += 1
+
+                if self._goal_test(node.state):
+                    return node, node_counter, len(stack), node.depth
+
+                children = [(child, node_h(child)) for child in self._expand_new(node, closed)]
+                # Reversed so the lowest f (the first one on ties) is popped next
+                children.sort(key=lambda entry: entry[0].depth + entry[1])
+                stack.extend(reversed(children))
+            bound = next_bound
+
+        return None, node_counter, 0, 0
+
+    def _estimate_node_bytes(self):
+        # A node, its state and box set, the one new box tuple per push, and frontier bookkeeping
+        state = self.initial_node.state
+        return (sys.getsizeof(self.initial_node) + sys.getsizeof(state) + sys.getsizeof(state.boxes) +
+                sys.getsizeof(state.player) + 200)
+
+    def _sma_star(self, heuristic_fn, max_nodes):
+        # Simplified memory-bounded A*: once more than max_nodes nodes are held, the worst leaf is
+        # forgotten and its parent goes back on the open list valued at its best forgotten child, so
+        # that branch is regenerated only if it becomes the most promising again. A state held in
+        # memory is not generated twice: a cheaper path replaces the old node and its subtree
+        node_h = self._node_heuristic(heuristic_fn)
+        root = self.initial_node
+        memory = SmaMemory(self._new_frontier)
+        memory.add(root, self._state_key(root.state), root.depth + node_h(root))
+        self.metrics.watch(memory.open)
+        node_counter = 0
+
+        while True:
+            node = memory.pop_best()
+            if node is None:
+                break
+            node_counter += 1
+
+            if self._goal_test(node.state):
+                return node, node_counter, len(memory.open), node.depth
+
+            # A node popped again only regenerates the children it forgot
+            live = memory.children.setdefault(node, {})
+            memory.forgotten.pop(node, None)
+            new_children = []
+            replaced = []
+            for child in self._expand(node):
+                if child.action in live:
+                    continue
+                key = self._state_key(child.state)
+                held = memory.by_key.get(key)
+                if held is not None:
+                    if held.depth <= child.depth:
+                        self.metrics.deduplicated += 1
+                        continue
+                    replaced.append(held)
+                # Pathmax keeps f monotone along a path, including backed-up values
+                new_children.append((child, key, max(memory.f_values[node], child.depth + node_h(child))))
+
+            if not new_children and not live:
+                if node is not root:
+                    memory.close(node)
+                continue
+
+            # The old copies may sit under this node, so they go once it holds its new children
+            for child, key, f in new_children:
+                memory.add(child, key, f)
+            for held in replaced:
+                # An earlier replacement may have taken it along already
+                if held in memory.f_values:
+                    memory.replace(held)
+            while len(memory) > max_nodes:
+                leaf = memory.pop_worst(root)
+                if leaf is None:
+                    break
+                memory.forget(leaf)
+                self.memory_bounded = True
+
+        return None, node_counter, 0, 0
+
+    def _get_incremental_heuristics(self):
+        if self._incremental_heuristics is None:
+            static = self.static_map
+            manhattan_table = {}
+            grid_table = {}
+            for point in static.floor:
+                x, y = point
+                manhattan_table[point] = min([self._manhattan_distance(point, goal) for goal in static.goals])
+                grid_table[point] = self.grid[y][x]
+            manhattan_boxes = CellTableHeuristic(manhattan_table)
+            freedom_degrees = FreedomDegreesHeuristic(static)
+            self._incremental_heuristics = {
+                self._heuristic_manhattan_boxes: manhattan_boxes,
+                self._heuristic_freedom_degrees: freedom_degrees,
+                self._combined_heuristics: CombinedHeuristic(manhattan_boxes, freedom_degrees,
+                                                             self._heuristic_manhattan_player),
+                self._grid_heuristic: CellTableHeuristic(grid_table),
+            }
+        return self._incremental_heuristics
+
+    def _get_batch_heuristics(self):
+        if self._batch_heuristics is None:
+            static = self.static_map
+            manhattan_table = cell_table(static, lambda point: min([self._manhattan_distance(point, goal)
+                                                                    for goal in static.goals]))
+            self._batch_heuristics = {
+                self._heuristic_manhattan_boxes: CellTableBatch(static, manhattan_table),
+                self._heuristic_manhattan_player: PlayerDistanceBatch(static),
+            }
+        return self._batch_heuristics
+
+    def _nodes_heuristic(self, heuristic_fn):
+        # Values for all the children of an expansion. An incremental update is cheaper than a batch,
+        # so the batch only serves heuristics evaluated from scratch, and only for expansions with
+        # enough box cells to pay for the NumPy call (the batch's min_cells, whatever the mode)
+        node_h = self._node_heuristic(heuristic_fn)
+        batch = self._get_batch_heuristics().get(heuristic_fn) if self.batch and np is not None else None
+        if batch is None or (self.incremental and heuristic_fn in self._get_incremental_heuristics()):
+            return lambda nodes: [node_h(node) for node in nodes]
+        box_count = len(self.initial_node.state.boxes)
+
+        def h(nodes):
+            if len(nodes) * box_count < batch.min_cells:
+                return [heuristic_fn(node.state) for node in nodes]
+            return batch.evaluate([node.state for node in nodes])
+        return self.metrics.timed(h, "heuristic")
+
+    def _moved_box(self, node):
+        # (old, new) cells of the box the action pushed, or None for a plain walk
+        if node.state.boxes is node.parent.state.boxes:
+            return None
+        if self.mode == "pushes":
+            box, direction = node.action
+        else:
+            box = node.state.player
+            direction = node.action
+        x_diff, y_diff = direction.value
+        return box, (box[0] + x_diff, box[1] + y_diff)
+
+    def _node_heuristic(self, heuristic_fn):
+        # Heuristics with an incremental form update the parent's cached aggregate instead of
+        # rescanning every box; the others are evaluated from scratch
+        incremental = self._get_incremental_heuristics().get(heuristic_fn) if self.incremental else None
+        if incremental is None:
+            return self.metrics.timed(lambda node: heuristic_fn(node.state), "heuristic")
+
+        def h(node):
+            parent = node.parent
+            if parent is None or parent.h_cache is None:
+                node.h_cache = incremental.initial(node.state)
+            else:
+                moved = self._moved_box(node)
+                if moved is None:
+                    node.h_cache = parent.h_cache
+                else:
+                    node.h_cache = incremental.update(parent.h_cache, parent.state, node.state, *moved)
+            return incremental.value(node.h_cache, node.state)
+        return self.metrics.timed(h, "heuristic")
+
+    def _expand_backward(self, node):
+        self._check_limits()
+        start = time.perf_counter()
+        children = [self.TreeNode(node.state.pulled(pull), node, pull, node.depth + 1)
+                    for pull in node.state.get_valid_pulls()]
+        self.metrics.timings["successors"] += time.perf_counter() - start
+        self.metrics.generated += len(children)
+        return children
+
+    def _join(self, forward_node, backward_node):
+        # Forward pushes up to the meeting state, then the backward pulls undone as pushes
+        pushes = []
+        node = forward_node
+        while node.parent is not None:
+            pushes.append(node.action)
+            node = node.parent
+        pushes.reverse()
+        node = backward_node
+        while node.parent is not None:
+            box, direction = node.action
+            x_diff, y_diff = direction.value
+            pushes.append(((box[0] + x_diff, box[1] + y_diff), self.Direction((-x_diff, -y_diff))))
+            node = node.parent
+
+        node = self.initial_node
+        for push in pushes:
+            node = self.TreeNode(node.state.pushed(push), node, push, node.depth + 1)
+        if not self._replay(self._solution_moves(node)):
+            raise RuntimeError("Bidirectional search joined an invalid solution")
+        return node
+
+    def _bidirectional(self):
+        # Forward push search from the start and backward pull search from the goals, one BFS layer
+        # at a time on the smaller side, until both reach the same canonical state
+        forward_tables = {self.initial_node.state.canonical_key(): self.initial_node}
+        backward_tables = {}
+        for state in goal_roots(self.static_map, len(self.initial_node.state.boxes)):
+            backward_tables.setdefault(state.canonical_key(), self.TreeNode(state))
+        forward_frontier = deque([self.initial_node])
+        backward_frontier = deque(backward_tables.values())
+        self.metrics.watch(forward_frontier, backward_frontier)
+        node_counter = 0
+
+        meeting = backward_tables.get(self.initial_node.state.canonical_key())
+        if meeting is not None:
+            node = self._join(self.initial_node, meeting)
+            return node, node_counter, 0, node.depth
+
+        while forward_frontier and backward_frontier:
+            forward = len(forward_frontier) <= len(backward_frontier)
+            if forward:
+                frontier, table, other, expand = forward_frontier, forward_tables, backward_tables, self._expand
+            else:
+                frontier, table, other, expand = backward_frontier, backward_tables, forward_tables, \
+                    self._expand_backward
+            for _ in range(len(frontier)):
+                node = frontier.popleft()
+                node_counter += 1
+                for child in expand(node):
+                    key = child.state.canonical_key()
+                    if key in table:
+                        self.metrics.deduplicated += 1
+                        continue
+                    table[key] = child
+                    if key in other:
+                        node = self._join(child, other[key]) if forward else self._join(other[key], child)
+                        return node, node_counter, len(forward_frontier) + len(backward_frontier), node.depth
+                    frontier.append(child)
+
+        return None, node_counter, len(forward_frontier) + len(backward_frontier), 0
+
+    def _replay(self, moves):
+        return replay(self.initial_sokoban, moves)
+
     def _goal_test(self, state):
         return state.level_complete()
 
     def _actions_fn(self, state):
+        if self.mode == "pushes":
+            return state.get_valid_pushes()
         return state.get_valid_directions()
 
     def _apply_action(self, state, action):
-        new_state = copy.deepcopy(state)
-        new_state.move_player(action)
-        return new_state
+        if self.mode == "pushes":
+            return state.pushed(action)
+        return state.moved(action)
+
+    def _solution_moves(self, node):
+        # Rebuilds the move-level solution; push actions only get their walking path here
+        actions = []
+        while node.parent is not None:
+            actions.append(node.action)
+            node = node.parent
+        actions.reverse()
+        if self.mode != "pushes":
+            return actions
+
+        moves = []
+        state = node.state
+        for box, direction in actions:
+            x_diff, y_diff = direction.value
+            moves.extend(state.path_to((box[0] - x_diff, box[1] - y_diff)))
+            moves.append(direction)
+            state = state.pushed((box, direction))
+        return moves
+
+    def _count_pushes(self, moves):
+        state = self.initial_node.state
+        pushes = 0
+        for direction in moves:
+            x, y = state.player
+            x_diff, y_diff = direction.value
+            if (x + x_diff, y + y_diff) in state.boxes:
+                pushes += 1
+            state = state.moved(direction)
+        return pushes
+
+    def _check_limits(self):
+        self.expanded += 1
+        self.metrics.on_expand(self.expanded)
+        if self.cancel is not None and self.cancel.reason is not None:
+            raise SearchLimitReached(self.cancel.reason, self.expanded)
+        if self.max_nodes is not None and self.expanded > self.max_nodes:
+            raise SearchLimitReached("node_limit", self.expanded)
+        if self.expanded % SAMPLE_EVERY == 0:
+            if self.deadline is not None and time.time() > self.deadline:
+                raise SearchLimitReached("time_limit", self.expanded)
+            # The metrics read the resident memory on the same expansions
+            if self.memory_limit is not None and (self.metrics.rss_mb or 0) > self.memory_limit:
+                raise SearchLimitReached("memory_limit", self.expanded)
+
+    def _expand(self, node):
+        self._check_limits()
+        start = time.perf_counter()
+        children = []
+        for action in self._actions_fn(node.state):
+            new_state = self._apply_action(node.state, action)
+            if self.deadlocks.is_deadlock(node.state, new_state):
+                continue
+            children.append(self.TreeNode(new_state, node, action, node.depth + 1))
+        self.metrics.timings["successors"] += time.perf_counter() - start
+        self.metrics.generated += len(children)
+        return children
 
     def _manhattan_distance(self, elem, goal):
         (x, y) = elem
@@ -215,64 +866,269 @@ class SokobanSolver:
             val += self.grid[i][j]
         return val
 
-    def play_sokoban_with_algorithm(self, algorithm_name, heuristic_name, max_depth):
-        heuristic_func = ""
-        start_time = time.time()
-        result = None
-        node_counter = 0
-        node_frontier = 0
-        depth = 0
+    def _heuristic_matching(self, state):
+        # Pushes needed when each box goes to its own goal, from the precomputed push-distance tables
+        index = self.static_map.index
+        boxes = state.get_boxes()
+        if len(boxes) > MATCHING_MAX_BOXES:
+            nearest = self.static_map.nearest_goal_distances()
+            distances = [nearest[index(box)] for box in boxes]
+            return UNREACHABLE if UNREACHABLE in distances else sum(distances)
+        tables = self.static_map.goal_distances()
+        return min_cost_matching([[table[index(box)] for table in tables] for box in boxes])
+
+    def _budget_spent(self):
+        # The deadline or cancel of the running solve, for work done outside node expansions
+        return (self.deadline is not None and time.time() > self.deadline) or \
+            (self.cancel is not None and self.cancel.cancelled)
+
+    def _get_pattern_database(self):
+        # Built on first use within the solve's time budget and cancel; None when they stop the build
+        if self._pattern_database is None or self._pattern_database.size != self.pattern_size:
+            directory = self.cache.directory if self.cache is not None else None
+            self._pattern_database = load_pattern_database(self.static_map, self.pattern_size, directory,
+                                                           self._budget_spent)
+        return self._pattern_database
 
+    def _heuristic_pattern_db(self, state):
+        # Disjoint groups of boxes added up, never below the matching bound (both are admissible)
+        database = self._get_pattern_database() if len(state.get_boxes()) <= PATTERN_MAX_BOXES else None
+        if database is None:
+            return self._heuristic_matching(state)
+        value = database.additive(state.get_boxes())
+        return value if value == UNREACHABLE else max(value, self._heuristic_matching(state))
+
+    def _heuristic_pattern_db_max(self, state):
+        # The costliest group of boxes, never below the matching bound
+        database = self._get_pattern_database() if len(state.get_boxes()) <= PATTERN_MAX_BOXES else None
+        if database is None:
+            return self._heuristic_matching(state)
+        value = database.maximum(state.get_boxes())
+        return value if value == UNREACHABLE else max(value, self._heuristic_matching(state))
+
+    def _get_heuristic(self, heuristic_name):
         # Choose the heuristic to use
-        if (heuristic_name not in ["manhattan_boxes", "manhattan_player", "freedom_degrees", "combined", "grid"]):
+        if heuristic_name not in HEURISTICS:
             raise ValueError("Invalid heuristic name")
         elif heuristic_name == "manhattan_boxes":
-            heuristic_func = self._heuristic_manhattan_boxes
+            return self._heuristic_manhattan_boxes
         elif heuristic_name == "manhattan_player":
-            heuristic_func = self._heuristic_manhattan_player
+            return self._heuristic_manhattan_player
         elif heuristic_name == "freedom_degrees":
-            heuristic_func = self._heuristic_freedom_degrees
+            return self._heuristic_freedom_degrees
         elif heuristic_name == "combined":
-            heuristic_func = self._combined_heuristics
+            return self._combined_heuristics
         elif heuristic_name == "grid":
-            heuristic_func = self._grid_heuristic
+            return self._grid_heuristic
+        elif heuristic_name == "matching":
+            return self._heuristic_matching
+        elif heuristic_name == "pattern_db":
+            return self._heuristic_pattern_db
+        elif heuristic_name == "pattern_db_max":
+            return self._heuristic_pattern_db_max
 
-        # Choose the algorithm to use
-        if (algorithm_name not in ["bfs", "dfs", "iddfs", "local_greedy", "global_greedy", "a_star"]):
+    def solve(self, algorithm_name, heuristic_name=None, max_depth=0, dedup=True, mode="moves",
+              deadlocks=("dead_squares", "freeze"), max_nodes=None, time_limit=None, max_memory=None, workers=1,
+              progress=None, profile=None, weights=None, cancel=None, on_solution=None, progress_interval=1.0,
+              memory_limit=None, decompose=False):
+        # max_memory is in bytes and bounds the node store of ida_star and sma_star;
+        # workers is the number of processes hda_star splits the search over.
+        # progress is called with the SearchMetrics every progress_interval seconds; profile is "cpu", "memory"
+        # or both (defaults to the SOKOBAN_PROFILE environment variable).
+        # weights is the decreasing weight schedule of anytime_a_star and on_solution is called with a
+        # SearchResult for each better solution it finds. cancel is a Cancellation that stops the search
+        # from another thread. memory_limit, in MB, stops the search once the process holds more resident
+        # memory (for hda_star, the coordinator and its workers together).
+        # decompose first tries to solve the level's independent box/goal groups separately (see decomposition),
+        # over workers processes, in "pushes" mode, with the cost counted in mode. The groups share the time and
+        # node budgets; a whole-level search that follows if they fail gets what is left, and the counts add up
+        if algorithm_name not in ALGORITHMS:
             raise ValueError("Invalid algorithm name")
-        elif algorithm_name == "bfs":
-            result, node_counter, node_frontier, depth = self._bfs()
-        elif algorithm_name == "dfs":
-            result, node_counter, node_frontier, depth = self._dfs()
-        elif algorithm_name == "iddfs":
-            result, node_counter, depth = self._iddfs(max_depth)
-        elif algorithm_name == "local_greedy":
-            result, node_counter, depth = self._local_greedy(0, heuristic_func)
-        elif algorithm_name == "global_greedy":
-            result, node_counter, node_frontier, depth = self._global_greedy(heuristic_func)
-        elif algorithm_name == "a_star":
-            result, node_counter, node_frontier, depth = self._a_star(heuristic_func)
+        if heuristic_name is None and algorithm_name in INFORMED_ALGORITHMS:
+            raise ValueError(f"Algorithm {algorithm_name} needs a heuristic")
+        heuristic_func = self._get_heuristic(heuristic_name) if heuristic_name is not None else None
+        if mode not in ["moves", "pushes"]:
+            raise ValueError("Invalid search mode")
+        if algorithm_name in PUSH_ALGORITHMS:
+            mode = "pushes"
+        if any(rule not in RULES for rule in deadlocks):
+            raise ValueError("Invalid deadlock rule")
+        weights = ANYTIME_WEIGHTS if weights is None else list(weights)
+        if not weights or any(weight < 1 for weight in weights):
+            raise ValueError("Anytime weights must be at least 1")
+        modes = profile_modes(profile)
+
+        self.mode = mode
+        self.dedup = dedup
+        self.closed_set = None
+        self.deadlocks = DeadlockDetector(self.static_map, deadlocks)
+        self.expanded = 0
+        self.max_nodes = max_nodes
+        self.memory_limit = memory_limit
+        self.cancel = cancel
+        self.incumbent = None
+        self.memory_bounded = False
+        self.on_solution = on_solution
+        self._result = result = SearchResult(algorithm_name, heuristic_name, mode)
+        self.metrics = metrics = SearchMetrics(progress, progress_interval)
+        self.deadline = time.time() + time_limit if time_limit is not None else None
+        metrics.start()
+        # Uninformed searches ignore the heuristic, so it is left out of their key and optimality
+        key_heuristic = heuristic_name if algorithm_name in INFORMED_ALGORITHMS else None
+        key = solution_key(algorithm_name, key_heuristic, mode, dedup, deadlocks,
+                           weights if algorithm_name == "anytime_a_star" else None, decompose,
+                           max_depth if algorithm_name in DEPTH_BOUNDED_ALGORITHMS else None)
+        if self.cache is not None and self._cached_result(result, key):
+            metrics.finish()
+            result.time = metrics.wall_time
+            result.metrics = metrics
+            return result
+        node = None
+        moves = None
+        try:
+            with Profiling(metrics, modes):
+                if decompose:
+                    moves, subproblems, decomposed = solve_decomposed(self, algorithm_name, heuristic_name, workers,
+                                                                      cancel, self.deadline, max_nodes,
+                                                                      max_depth=max_depth, dedup=dedup,
+                                                                      deadlocks=deadlocks, max_memory=max_memory,
+                                                                      memory_limit=memory_limit, weights=weights)
+                    if subproblems:
+                        result.subproblems = subproblems
+                    if max_nodes is not None:
+                        self.max_nodes = max(0, max_nodes - decomposed["nodes"])
+                if moves is not None:
+                    result.stitched = True
+                elif algorithm_name == "bfs":
+                    node, result.nodes, result.frontier, result.cost = self._bfs()
+                elif algorithm_name == "dfs":
+                    node, result.nodes, result.frontier, result.cost = self._dfs()
+                elif algorithm_name == "iddfs":
+                    node, result.nodes, result.cost = self._iddfs(max_depth)
+                elif algorithm_name == "local_greedy":
+                    node, result.nodes, result.cost = self._local_greedy(0, heuristic_func)
+                elif algorithm_name == "global_greedy":
+                    node, result.nodes, result.frontier, result.cost = self._global_greedy(heuristic_func)
+                elif algorithm_name == "a_star":
+                    node, result.nodes, result.frontier, result.cost = self._a_star(heuristic_func)
+                elif algorithm_name == "anytime_a_star":
+                    node, result.nodes, result.frontier, result.cost = self._anytime_a_star(heuristic_func, weights)
+                elif algorithm_name == "hda_star":
+                    if workers < 1:
+                        raise ValueError("Algorithm hda_star needs at least one worker")
+                    node, result.nodes, result.frontier, result.cost = self._hda_star(heuristic_name, workers)
+                elif algorithm_name == "ida_star":
+                    table_size = IDA_STAR_TABLE_SIZE if max_memory is None else max_memory // 200
+                    node, result.nodes, result.frontier, result.cost = self._ida_star(heuristic_func, table_size)
+                elif algorithm_name == "sma_star":
+                    if max_memory is None:
+                        raise ValueError("Algorithm sma_star needs a memory budget")
+                    max_nodes_in_memory = max(2, max_memory // self._estimate_node_bytes())
+                    node, result.nodes, result.frontier, result.cost = self._sma_star(heuristic_func,
+                                                                                      max_nodes_in_memory)
+                elif algorithm_name == "bidirectional":
+                    node, result.nodes, result.frontier, result.cost = self._bidirectional()
+        except SearchLimitReached as limit:
+            result.status = limit.reason
+            result.nodes = limit.nodes
+            # An anytime search that was stopped still returns its best solution
+            if self.incumbent is not None:
+                node = self.incumbent[0]
+                result.limit = limit.reason
+        metrics.finish()
+        result.time = metrics.wall_time
+
+        # Successors are counted as they are generated; searches with a closed set also report its duplicates
+        if self.closed_set is not None:
+            metrics.deduplicated = self.closed_set.duplicates
+            metrics.reopened = self.closed_set.reopened
+        result.pruned = {rule: self.deadlocks.pruned[rule] for rule in deadlocks}
+        if decompose:
+            result.nodes += decomposed["nodes"]
+            result.frontier += decomposed["frontier"]
+            metrics.expanded += decomposed["nodes"]
+            metrics.generated += decomposed["generated"]
+            metrics.deduplicated += decomposed["deduplicated"]
+            metrics.reopened += decomposed["reopened"]
+            for rule, pruned in decomposed["pruned"].items():
+                result.pruned[rule] += pruned
+        result.generated = metrics.generated
+        result.deduplicated = metrics.deduplicated
+        result.reopened = metrics.reopened
+        metrics.pruned = dict(result.pruned)
+        result.metrics = metrics
+        if self.incumbent is not None:
+            result.bound = self.incumbent[2]
+        if node:
+            self._set_solution(result, node)
+        elif moves is not None:
+            result.status = "solved"
+            result.moves = moves
+            result.pushes = self._count_pushes(moves)
+            result.cost = result.pushes if mode == "pushes" else len(moves)
+        else:
+            result.cost = 0
+        if result.solved and self.cache is not None and self._cacheable(result):
+            self._cache_result(result, key, key_heuristic)
+        return result
+
+    def _set_solution(self, result, node):
+        result.status = "solved"
+        result.node = node
+        result.cost = node.depth
+        result.moves = self._solution_moves(node)
+        result.pushes = self._count_pushes(result.moves)
+
+    def play_sokoban_with_algorithm(self, algorithm_name, heuristic_name, max_depth, dedup=True, mode="moves",
+                                    deadlocks=("dead_squares", "freeze"), max_nodes=None, time_limit=None,
+                                    max_memory=None, workers=1, progress=None, profile=None, show_path=True):
+        self._get_heuristic(heuristic_name)
+        result = self.solve(algorithm_name, heuristic_name, max_depth, dedup, mode, deadlocks, max_nodes, time_limit,
+                            max_memory, workers, progress, profile)
         print(f"Algorithm : {algorithm_name}")
         print(f"with heuristic : {heuristic_name}")
-        end_time = time.time()
-        execution_time = end_time - start_time
+        print(f"in mode : {result.mode}")
+        if algorithm_name == "hda_star":
+            print(f"with workers : {workers}")
 
         # Process the result
-        if result:
-            print("Solution found:")
-            print(f"Nodes visited: {node_counter}")
-            print(f"Nodes frontera: {node_frontier}")
-            print(f"Costo: {depth}")
-
-            def rec_path(node):
-                if (node.parent is None):
-                    x, y, _ = node.state.get_player()
-                    print(f"X: {x}, Y: {y}")
-                    return
-                rec_path(node.parent)
-                x, y, _ = node.state.get_player()
+        if result.solved:
+            print("Solution found in the cache:" if result.cached else "Solution found:")
+            print(f"Nodes visited: {result.nodes}")
+            print(f"Nodes frontera: {result.frontier}")
+            print(f"Costo: {result.cost}")
+            print(f"Nodes generated: {result.generated}")
+            print(f"Nodes deduplicated: {result.deduplicated}")
+            print(f"Nodes reopened: {result.reopened}")
+            for rule in deadlocks:
+                print(f"Nodes pruned by {rule}: {result.pruned[rule]}")
+            print(f"Pushes: {result.pushes}")
+            print(f"Moves: {len(result.moves)}")
+            if result.limit is not None:
+                print(f"Search stopped by {result.limit}, best solution so far")
+            if result.bound is not None:
+                print(f"Within {result.bound:.3f}x of the optimal cost")
+
+            if show_path:
+                state = self.initial_node.state
+                x, y = state.player
                 print(f"X: {x}, Y: {y}")
-            rec_path(result)
+                for direction in result.moves:
+                    state = state.moved(direction)
+                    x, y = state.player
+                    print(f"X: {x}, Y: {y}")
+        elif result.status != "no_solution":
+            print(f"Search stopped: {result.status} after {result.nodes} nodes")
         else:
             print("No solution found")
-        print(f"In {execution_time}s")
+        metrics = result.metrics
+        print(f"Peak frontier: {metrics.peak_frontier}")
+        print(f"Nodes per second: {metrics.nodes_per_second:.0f}")
+        print("Time in " + ", ".join(f"{category} {seconds:.3f}s" for category, seconds in metrics.timings.items()))
+        if metrics.peak_rss_mb is not None:
+            print(f"Peak memory: {metrics.peak_rss_mb} MB")
+        for report in [metrics.cpu_profile, metrics.memory_profile]:
+            if report:
+                print(report)
+        print(f"In {result.time}s")
+        return result
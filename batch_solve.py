@@ -0,0 +1,204 @@
+import argparse
+import json
+import multiprocessing
+import signal
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from algorithms import ALGORITHMS, HEURISTICS, INFORMED_ALGORITHMS, Cancellation, EventCancellation, SokobanSolver
+from cli import parse_levels
+from deadlock import RULES
+from level_library import LevelLibrary
+from lurd import to_lurd
+from sokoban import Sokoban
+from solution_cache import SolutionCache
+
+# In a worker process: the EventCancellation the parent cancels on SIGINT/SIGTERM
+_interruption = None
+
+
+def parse_sources(sources, default_levels):
+    # "levels.txt", "levels.txt:1-10" or "collection.xsb:3,7"; a file without a range uses
+    # default_levels, or all its levels when that is empty
+    jobs = []
+    for source in sources:
+        levels_file, _, levels = source.partition(":")
+        library = LevelLibrary.shared(levels_file)
+        available = library.levels(levels_file)
+        wanted = parse_levels(levels or default_levels) if (levels or default_levels) else available
+        for level in wanted:
+            if level not in available:
+                raise ValueError(f"Level {level} does not exist in {levels_file}")
+            jobs.append((levels_file, level))
+    return jobs
+
+
+def solve_level(levels_file, level, options, cancel=None):
+    # One JSON-ready record; errors inside the solver become an "error" status instead of ending the batch
+    record = {"file": levels_file, "level": level, "algorithm": options["algorithm"],
+              "heuristic": options["heuristic"], "mode": options["mode"]}
+    if cancel is not None and cancel.cancelled:
+        # Queued in a worker before the interrupt: report it without starting the search
+        record["status"] = cancel.reason
+        return record
+    try:
+        sokoban = Sokoban.from_parsed(LevelLibrary.shared(levels_file).get(level))
+        cache = SolutionCache(options["cache"]) if options["cache"] else None
+        solver = SokobanSolver(sokoban, cache=cache)
+        result = solver.solve(options["algorithm"], options["heuristic"], options["max_depth"], mode=options["mode"],
+                              deadlocks=options["deadlocks"], max_nodes=options["node_limit"],
+                              time_limit=options["time_limit"], memory_limit=options["memory_limit"],
+                              workers=options["workers_per_level"], cancel=cancel, decompose=options["decompose"])
+    except (RuntimeError, RecursionError, ValueError, MemoryError) as error:
+        record.update({"status": "error", "error": str(error)})
+        return record
+    metrics = result.metrics.to_dict()
+    del metrics["samples"]
+    record.update({
+        "status": result.status,
+        "lurd": to_lurd(solver.initial_node.state, result.moves) if result.moves else None,
+        "moves": len(result.moves),
+        "pushes": result.pushes,
+        "cost": result.cost,
+        "cached": result.cached,
+        "limit": result.limit,
+        "bound": result.bound,
+        "subproblems": result.subproblems,
+        "stats": metrics,
+    })
+    return record
+
+
+def _watch_interruption(interruption):
+    # Ctrl-C reaches the whole process group; workers leave it to the parent and watch the cancel instead
+    global _interruption
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    _interruption = interruption
+
+
+def _solve_in_worker(levels_file, level, options):
+    return solve_level(levels_file, level, options, _interruption)
+
+
+def emit(record, output):
+    output.write(json.dumps(record) + "\n")
+    output.flush()
+    print(f"{record['file']}:{record['level']} {record['status']}"
+          + (f" cost {record['cost']} in {record['stats']['wall_time']}s" if "stats" in record else ""),
+          file=sys.stderr, flush=True)
+
+
+def run_serial(jobs, options, output):
+    # SIGINT/SIGTERM finish the level being searched with status "interrupted" and skip the rest
+    cancel = Cancellation()
+
+    def interrupt(signum, frame):
+        cancel.cancel("interrupted")
+    previous = {signum: signal.signal(signum, interrupt) for signum in [signal.SIGINT, signal.SIGTERM]}
+    records = []
+    try:
+        for levels_file, level in jobs:
+            if cancel.cancelled:
+                break
+            records.append(solve_level(levels_file, level, options, cancel))
+            emit(records[-1], output)
+    finally:
+        for signum, old in previous.items():
+            signal.signal(signum, old)
+    return records
+
+
+def run_parallel(jobs, options, output, workers):
+    # One fresh process per level, so memory_limit measures that level alone. SIGINT/SIGTERM finish the
+    # levels being searched with status "interrupted" and skip the ones not started yet
+    # max_tasks_per_child needs spawned workers, and the cancel must come from the same context
+    context = multiprocessing.get_context("spawn")
+    interruption = EventCancellation(context)
+    records = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, max_tasks_per_child=1,
+                             initializer=_watch_interruption, initargs=(interruption,)) as executor:
+        futures = [executor.submit(_solve_in_worker, levels_file, level, options) for levels_file, level in jobs]
+
+        def interrupt(signum, frame):
+            interruption.cancel("interrupted")
+            for future in futures:
+                future.cancel()
+        previous = {signum: signal.signal(signum, interrupt) for signum in [signal.SIGINT, signal.SIGTERM]}
+        try:
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                records.append(future.result())
+                emit(records[-1], output)
+        finally:
+            for signum, old in previous.items():
+                signal.signal(signum, old)
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve levels headlessly, one JSON line per level on stdout")
+    parser.add_argument("sources", nargs="*", default=["levels.txt"],
+                        help="level files, optionally with a range: levels.txt:1-10, collection.xsb:3,7")
+    parser.add_argument("--levels", default="", help="levels of the files given without a range (default: all)")
+    parser.add_argument("--algorithm", default="a_star", choices=ALGORITHMS)
+    parser.add_argument("--heuristic", default="matching", choices=HEURISTICS,
+                        help="heuristic of the informed algorithms")
+    parser.add_argument("--mode", default="pushes", choices=["moves", "pushes"])
+    parser.add_argument("--deadlocks", default="dead_squares,freeze",
+                        help=f"deadlock rules, comma separated, from {', '.join(RULES)}")
+    parser.add_argument("--max-depth", type=int, default=1000, help="depth limit of iddfs")
+    parser.add_argument("--time-limit", type=float, default=60.0, help="seconds per level")
+    parser.add_argument("--node-limit", type=int, default=None, help="expanded nodes per level")
+    parser.add_argument("--memory-limit", type=float, default=None, help="resident memory per level, in MB")
+    parser.add_argument("--workers", type=int, default=1, help="levels solved in parallel")
+    parser.add_argument("--hda-workers", type=int, default=1,
+                        help="processes per level for hda_star and for the groups of --decompose")
+    parser.add_argument("--decompose", action="store_true",
+                        help="solve independent box/goal groups separately when a level has them")
+    parser.add_argument("--cache", help="solution cache directory")
+    parser.add_argument("--output", help="write the JSON lines to this file instead of stdout")
+    args = parser.parse_args()
+
+    try:
+        jobs = parse_sources(args.sources, args.levels)
+    except (OSError, RuntimeError, ValueError) as error:
+        parser.error(str(error))
+    deadlocks = tuple(rule for rule in args.deadlocks.split(",") if rule)
+    for rule in deadlocks:
+        if rule not in RULES:
+            parser.error(f"invalid deadlock rule {rule!r} (choose from {', '.join(RULES)})")
+    options = {
+        "algorithm": args.algorithm,
+        "heuristic": args.heuristic if args.algorithm in INFORMED_ALGORITHMS else None,
+        "mode": args.mode,
+        "deadlocks": deadlocks,
+        "max_depth": args.max_depth,
+        "time_limit": args.time_limit if args.time_limit > 0 else None,
+        "node_limit": args.node_limit,
+        "memory_limit": args.memory_limit,
+        "workers_per_level": args.hda_workers,
+        "cache": args.cache,
+        "decompose": args.decompose,
+    }
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        if args.workers > 1:
+            records = run_parallel(jobs, options, output, args.workers)
+        else:
+            records = run_serial(jobs, options, output)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    solved = sum(1 for record in records if record["status"] == "solved")
+    print(f"Solved {solved}/{len(jobs)} levels", file=sys.stderr)
+    if len(records) < len(jobs):
+        sys.exit(130)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+import os
+import sys
+
+from algorithms import SokobanSolver
+from sokoban import Sokoban
+
+# A level that plain A* solves in a few seconds with the matching heuristic
+DEFAULT_LEVELS = [4]
+WORKER_COUNTS = [1, 2, 4, 8]
+
+
+def benchmark_level(level, levels_file, heuristic_name="matching"):
+    result = SokobanSolver(Sokoban(level, levels_file)).solve("a_star", heuristic_name, mode="pushes")
+    base_time = result.time
+    print(f"Level {level:>3} | a_star       | nodes {result.nodes:>8} | cost {result.cost:>4} | {base_time:7.2f}s")
+    for workers in WORKER_COUNTS:
+        result = SokobanSolver(Sokoban(level, levels_file)).solve("hda_star", heuristic_name, mode="pushes",
+                                                                 workers=workers)
+        print(f"Level {level:>3} | hda_star x{workers:<2} | nodes {result.nodes:>8} | cost {result.cost:>4} | "
+              f"{result.time:7.2f}s | speedup {base_time / result.time:5.2f}x")
+
+
+def main():
+    print(f"{os.cpu_count()} cores available")
+    levels = [int(level) for level in sys.argv[1:]] or DEFAULT_LEVELS
+    for level in levels:
+        benchmark_level(level, "levels.txt")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import random
+import sys
+import time
+
+from algorithms import SokobanSolver
+from batch_heuristics import np
+from sokoban import Sokoban
+
+# The levels of levels.txt with the most boxes
+DEFAULT_LEVELS = [50, 48, 49, 42, 43]
+HEURISTICS = ["manhattan_boxes", "freedom_degrees", "combined", "grid"]
+
+
+def random_transitions(solver, count, seed=0):
+    # (parent node, child node) pairs from random push sequences, restarting when stuck
+    rng = random.Random(seed)
+    solver.mode = "pushes"
+    transitions = []
+    node = solver.initial_node
+    while len(transitions) < count:
+        children = list(solver._expand(node))
+        if not children:
+            node = solver.initial_node
+            continue
+        child = rng.choice(children)
+        transitions.append((node, child))
+        node = child
+    return transitions
+
+
+def benchmark_level(level, levels_file, count):
+    solver = SokobanSolver(Sokoban(level, levels_file))
+    transitions = random_transitions(solver, count)
+    heuristic_fns = {
+        "manhattan_boxes": solver._heuristic_manhattan_boxes,
+        "freedom_degrees": solver._heuristic_freedom_degrees,
+        "combined": solver._combined_heuristics,
+        "grid": solver._grid_heuristic,
+    }
+    for heuristic_name in HEURISTICS:
+        heuristic_fn = heuristic_fns[heuristic_name]
+
+        start_time = time.perf_counter()
+        full = [heuristic_fn(child.state) for _, child in transitions]
+        full_time = time.perf_counter() - start_time
+
+        # Parents get their aggregate up front so only the parent -> child step is timed
+        node_h = solver._node_heuristic(heuristic_fn)
+        solver.initial_node.h_cache = None
+        for parent, _ in transitions:
+            if parent.h_cache is None:
+                node_h(parent)
+        start_time = time.perf_counter()
+        incremental = [node_h(child) for _, child in transitions]
+        incremental_time = time.perf_counter() - start_time
+
+        mismatches = sum(1 for a, b in zip(full, incremental) if abs(a - b) > 1e-9)
+        line = (f"Level {level:>3} | {heuristic_name:<16} | full {full_time:8.4f}s | "
+                f"incremental {incremental_time:8.4f}s | speedup {full_time / incremental_time:6.1f}x | "
+                f"mismatches {mismatches}")
+
+        # The batched form is timed over the same children, one frontier chunk at a time
+        batch = solver._get_batch_heuristics().get(heuristic_fn) if np is not None else None
+        if batch is not None:
+            states = [child.state for _, child in transitions]
+            start_time = time.perf_counter()
+            batched = batch.evaluate(states)
+            batched_time = time.perf_counter() - start_time
+            mismatches = sum(1 for a, b in zip(full, batched) if abs(a - b) > 1e-9)
+            line += (f" | batched {batched_time:8.4f}s | speedup {full_time / batched_time:6.1f}x | "
+                     f"mismatches {mismatches}")
+        print(line)
+
+
+def main():
+    levels = [int(level) for level in sys.argv[1:]] or DEFAULT_LEVELS
+    for level in levels:
+        benchmark_level(level, "levels.txt", 2000)
+
+
+if __name__ == "__main__":
+    main()
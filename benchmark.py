@@ -0,0 +1,144 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from algorithms import ALGORITHMS, HEURISTICS, INFORMED_ALGORITHMS, SokobanSolver
+from cli import parse_levels
+from metrics import peak_rss_mb
+from sokoban import Sokoban
+from solution_cache import SolutionCache
+
+FIELDS = ["level", "algorithm", "heuristic", "mode", "status", "nodes_expanded", "nodes_generated", "frontier",
+          "peak_frontier", "cost", "moves", "pushes", "wall_time", "peak_memory_mb"]
+
+
+def make_jobs(levels, algorithms, heuristics, mode):
+    # Checked here so that a typo fails before the pool starts instead of as an error row per job
+    for heuristic in heuristics:
+        if heuristic not in HEURISTICS:
+            raise ValueError(f"Invalid heuristic name {heuristic}")
+    jobs = []
+    for level in levels:
+        for algorithm in algorithms:
+            # Uninformed searches ignore the heuristic, so they run once per level
+            for heuristic in (heuristics if algorithm in INFORMED_ALGORITHMS else [None]):
+                jobs.append({"level": level, "algorithm": algorithm, "heuristic": heuristic, "mode": mode})
+    return jobs
+
+
+def run_job(job, levels_file, time_limit, node_limit, max_depth, cache_dir=None):
+    row = {"level": job["level"], "algorithm": job["algorithm"], "heuristic": job["heuristic"] or "",
+           "mode": job["mode"]}
+    try:
+        cache = SolutionCache(cache_dir) if cache_dir else None
+        solver = SokobanSolver(Sokoban(job["level"], levels_file), cache=cache)
+        result = solver.solve(job["algorithm"], job["heuristic"], max_depth, mode=job["mode"],
+                              max_nodes=node_limit, time_limit=time_limit)
+        row.update({"status": result.status, "nodes_expanded": result.nodes,
+                    "nodes_generated": result.metrics.generated, "frontier": result.frontier,
+                    "peak_frontier": result.metrics.peak_frontier, "cost": result.cost, "moves": len(result.moves),
+                    "pushes": result.pushes, "wall_time": round(result.time, 4)})
+    except Exception as error:
+        # Any failure stays on its own row; an exception escaping here would end the whole run
+        row.update({"status": f"error: {error}", "nodes_expanded": 0, "nodes_generated": 0, "frontier": 0,
+                    "peak_frontier": 0, "cost": 0, "moves": 0, "pushes": 0, "wall_time": 0.0})
+    # Each job runs in a fresh worker process; None where the platform cannot tell
+    row["peak_memory_mb"] = peak_rss_mb()
+    return row
+
+
+def run_benchmark(jobs, levels_file, workers, time_limit, node_limit, max_depth=0, cache_dir=None):
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1) as executor:
+        futures = [executor.submit(run_job, job, levels_file, time_limit, node_limit, max_depth, cache_dir)
+                   for job in jobs]
+        for future in as_completed(futures):
+            row = future.result()
+            print(f"Level {row['level']:>3} {row['algorithm']:<14} {row['heuristic']:<16} {row['status']:<12} "
+                  f"nodes {row['nodes_expanded']:>9} cost {row['cost']:>5} in {row['wall_time']}s", flush=True)
+            rows.append(row)
+    rows.sort(key=lambda row: (row["level"], row["algorithm"], row["heuristic"]))
+    return rows
+
+
+def write_csv(rows, path):
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def write_json(rows, path):
+    with open(path, "w") as file:
+        json.dump(rows, file, indent=1)
+
+
+def compare_with_baseline(rows, baseline_rows, tolerance):
+    # A job regresses when it stops solving, or needs noticeably more nodes or time than the baseline
+    baseline = {(row["level"], row["algorithm"], row["heuristic"], row["mode"]): row for row in baseline_rows}
+    regressions = []
+    for row in rows:
+        old = baseline.get((row["level"], row["algorithm"], row["heuristic"], row["mode"]))
+        if old is None:
+            continue
+        name = f"Level {row['level']} {row['algorithm']} {row['heuristic']} {row['mode']}"
+        if old["status"] == "solved" and row["status"] != "solved":
+            regressions.append(f"{name}: {old['status']} -> {row['status']}")
+        elif row["nodes_expanded"] > old["nodes_expanded"] * (1 + tolerance):
+            regressions.append(f"{name}: nodes {old['nodes_expanded']} -> {row['nodes_expanded']}")
+        # Sub-second jobs are too noisy to compare on time
+        elif row["wall_time"] > old["wall_time"] * (1 + tolerance) and row["wall_time"] - old["wall_time"] > 1:
+            regressions.append(f"{name}: time {old['wall_time']}s -> {row['wall_time']}s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the level x algorithm x heuristic matrix in parallel")
+    parser.add_argument("--levels", default="1-55", help="levels to run, e.g. 1-55 or 3,7,10-12")
+    parser.add_argument("--levels-file", default="levels.txt")
+    parser.add_argument("--algorithms", default="bfs,global_greedy,a_star")
+    parser.add_argument("--heuristics", default="manhattan_boxes,grid,matching")
+    parser.add_argument("--mode", default="pushes", choices=["moves", "pushes"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-limit", type=float, default=60.0, help="seconds per job")
+    parser.add_argument("--node-limit", type=int, default=1000000, help="expanded nodes per job")
+    parser.add_argument("--max-depth", type=int, default=1000, help="depth limit of iddfs")
+    parser.add_argument("--csv", help="write results to this CSV file")
+    parser.add_argument("--json", help="write results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of a previous run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown vs the baseline")
+    parser.add_argument("--cache", help="solution cache directory; solved jobs are replayed from it on later runs")
+    args = parser.parse_args()
+
+    algorithms = args.algorithms.split(",")
+    for algorithm in algorithms:
+        if algorithm not in ALGORITHMS:
+            parser.error(f"Invalid algorithm name {algorithm}")
+    try:
+        jobs = make_jobs(parse_levels(args.levels), algorithms, args.heuristics.split(","), args.mode)
+    except ValueError as error:
+        parser.error(str(error))
+    rows = run_benchmark(jobs, args.levels_file, args.workers, args.time_limit, args.node_limit, args.max_depth,
+                         cache_dir=args.cache)
+
+    if args.csv:
+        write_csv(rows, args.csv)
+    if args.json:
+        write_json(rows, args.json)
+    solved = sum(1 for row in rows if row["status"] == "solved")
+    print(f"Solved {solved}/{len(rows)} jobs")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare_with_baseline(rows, json.load(file), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from typing import Iterable, List, Tuple
+
+Point = Tuple[int, int]
+Offset = Tuple[int, int]
+
+# LEFT, RIGHT, UP, DOWN, the order Sokoban.Direction lists them in
+OFFSETS: List[Offset] = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+class BitboardLevel:
+    """Static bitboards of a level: one bit per cell for the floor and the goals.
+
+    Cell (x, y) is bit y * stride + x, with stride = width + 1: the extra column is
+    always a wall, so shifting a board one step left or right never wraps a cell onto
+    the floor of the neighbouring row. Box sets and player positions are plain ints
+    over the same layout, which makes move generation, flood fills and the goal test
+    a handful of shifts and masks.
+    """
+
+    def __init__(self, width: int, height: int, floor: Iterable[Point], goals: Iterable[Point]):
+        self.width = width
+        self.height = height
+        self.stride = width + 1
+        self.floor = self.bits_of(floor)
+        self.goals = self.bits_of(goals)
+        self.steps = {offset: offset[1] * self.stride + offset[0] for offset in OFFSETS}
+        self.steps[(0, 0)] = 0
+
+    def index(self, point: Point) -> int:
+        return point[1] * self.stride + point[0]
+
+    def point(self, index: int) -> Point:
+        y, x = divmod(index, self.stride)
+        return (x, y)
+
+    def bit(self, point: Point) -> int:
+        if point[0] < 0 or point[1] < 0 or point[0] >= self.width:
+            return 0
+        return 1 << self.index(point)
+
+    def bits_of(self, points: Iterable[Point]) -> int:
+        bits = 0
+        for point in points:
+            bits |= self.bit(point)
+        return bits
+
+    def points_of(self, bits: int) -> List[Point]:
+        points = []
+        while bits:
+            lowest = bits & -bits
+            points.append(self.point(lowest.bit_length() - 1))
+            bits ^= lowest
+        return points
+
+    def first_point(self, bits: int) -> Point:
+        # The top-left-most cell of a non-empty board
+        return self.point((bits & -bits).bit_length() - 1)
+
+    def shift(self, bits: int, offset: Offset) -> int:
+        step = self.steps[offset]
+        return bits << step if step >= 0 else bits >> -step
+
+    def neighbours(self, bits: int) -> int:
+        # Cells next to any cell of bits, walls included
+        return (bits << 1) | (bits >> 1) | (bits << self.stride) | (bits >> self.stride)
+
+    def reachable(self, player: int, boxes: int) -> int:
+        # Flood fill, one ring of neighbours per iteration for the whole region at once
+        free = self.floor & ~boxes
+        region = player
+        while True:
+            grown = region | (free & ((region << 1) | (region >> 1) |
+                                      (region << self.stride) | (region >> self.stride)))
+            if grown == region:
+                return region
+            region = grown
+
+    def can_step(self, player: int, boxes: int, offset: Offset) -> bool:
+        return bool(self.shift(player, offset) & self.floor & ~boxes)
+
+    def can_push(self, player: int, boxes: int, offset: Offset) -> bool:
+        target = self.shift(player, offset)
+        return bool(target & boxes and self.shift(target, offset) & self.floor & ~boxes)
+
+    def valid_moves(self, player: int, boxes: int) -> List[Offset]:
+        return [offset for offset in OFFSETS
+                if self.can_step(player, boxes, offset) or self.can_push(player, boxes, offset)]
+
+    def pushable(self, reachable: int, boxes: int, offset: Offset) -> int:
+        # Boxes with the player's region behind them and free floor in front
+        free = self.floor & ~boxes
+        opposite = (-offset[0], -offset[1])
+        return boxes & self.shift(reachable, offset) & self.shift(free, opposite)
+
+    def pullable(self, reachable: int, boxes: int, offset: Offset) -> int:
+        # Boxes with the player's region next to them and free floor behind the player
+        free = self.floor & ~boxes
+        opposite = (-offset[0], -offset[1])
+        return boxes & self.shift(reachable, opposite) & self.shift(self.shift(free, opposite), opposite)
+
+    def is_solved(self, boxes: int) -> bool:
+        return not boxes & ~self.goals
@@ -0,0 +1,16 @@
+from typing import List
+
+
+def parse_levels(text: str) -> List[int]:
+    # "1-55", "3,7,10-12"
+    levels = []
+    for part in text.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-", 1)
+            levels.extend(range(int(first), int(last) + 1))
+        else:
+            levels.append(int(part))
+    return levels
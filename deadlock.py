@@ -0,0 +1,171 @@
+from state import OFFSETS, SearchState, StaticMap
+
+RULES = ["dead_squares", "freeze", "corral"]
+# Push states the corral rule searches before giving up and keeping the node
+CORRAL_MAX_NODES = 200
+# Corral verdicts (per fence, area and player region) remembered between pushes before the memo is cleared
+CORRAL_CACHE_SIZE = 10000
+
+
+def simple_dead_squares(static: StaticMap):
+    # A box can reach a goal from a cell only if pulling it backwards from some goal gets there
+    live = set(static.goals)
+    stack = list(static.goals)
+    while stack:
+        x, y = stack.pop()
+        for x_diff, y_diff in OFFSETS:
+            # Player stands on the neighbour and steps back once more while pulling the box
+            box_target = (x + x_diff, y + y_diff)
+            player_target = (x + 2 * x_diff, y + 2 * y_diff)
+            if box_target not in live and box_target in static.floor and player_target in static.floor:
+                live.add(box_target)
+                stack.append(box_target)
+    return frozenset(static.floor - live)
+
+
+class DeadlockDetector:
+    """Prunes successors whose box layout can no longer be solved.
+
+    - dead_squares: a box was pushed onto a cell from which no goal is reachable
+    - freeze: the pushed box (or a box it now blocks) is stuck on both axes off a goal,
+      which covers blocked 2x2 squares and boxes pinned against walls
+    - corral: the pushed box fences an area the player cannot enter, its fence boxes can
+      only be pushed into it, and no sequence of pushes of those boxes alone (the other
+      boxes removed) opens the area or puts them all on goals (optional, runs a small
+      push search per new corral)
+    """
+
+    def __init__(self, static: StaticMap, rules=("dead_squares", "freeze")):
+        for rule in rules:
+            if rule not in RULES:
+                raise ValueError(f"Invalid deadlock rule {rule}")
+        self.static = static
+        self.rules = set(rules)
+        if static.dead_squares is None:
+            static.dead_squares = simple_dead_squares(static)
+        self.dead_squares = static.dead_squares
+        self.pruned = {rule: 0 for rule in RULES}
+        self._corrals = {}
+
+    def is_deadlock(self, parent: SearchState, child: SearchState) -> bool:
+        # Only a push can create a deadlock, and moved() reuses the box set when nothing was pushed
+        if not self.rules or child.boxes is parent.boxes:
+            return False
+        moved_box = next(iter(child.boxes - parent.boxes))
+
+        if "dead_squares" in self.rules and moved_box in self.dead_squares:
+            self.pruned["dead_squares"] += 1
+            return True
+        if "freeze" in self.rules and self._freeze_deadlock(moved_box, child.boxes):
+            self.pruned["freeze"] += 1
+            return True
+        if "corral" in self.rules and self._corral_deadlock(child, moved_box):
+            self.pruned["corral"] += 1
+            return True
+        return False
+
+    def _is_blocking(self, point, assumed_walls):
+        return point not in self.static.floor or point in assumed_walls
+
+    def _axis_blocked(self, box, offset, boxes, assumed_walls):
+        x, y = box
+        x_diff, y_diff = offset
+        before = (x - x_diff, y - y_diff)
+        after = (x + x_diff, y + y_diff)
+        if self._is_blocking(before, assumed_walls) or self._is_blocking(after, assumed_walls):
+            return True
+        if before in self.dead_squares and after in self.dead_squares:
+            return True
+        # A neighbouring box blocks this axis if it is frozen itself, with this box treated as a wall
+        assumed_walls = assumed_walls | {box}
+        for neighbour in (before, after):
+            if neighbour in boxes and self._is_frozen(neighbour, boxes, assumed_walls):
+                return True
+        return False
+
+    def _is_frozen(self, box, boxes, assumed_walls=frozenset()):
+        return (self._axis_blocked(box, (1, 0), boxes, assumed_walls) and
+                self._axis_blocked(box, (0, 1), boxes, assumed_walls))
+
+    def _freeze_deadlock(self, moved_box, boxes):
+        if not self._is_frozen(moved_box, boxes):
+            return False
+        goals = self.static.goals
+        if moved_box not in goals:
+            return True
+        # A box frozen on its goal may still pin a neighbour that is not on one
+        x, y = moved_box
+        for x_diff, y_diff in OFFSETS:
+            neighbour = (x + x_diff, y + y_diff)
+            if neighbour in boxes and neighbour not in goals and self._is_frozen(neighbour, boxes):
+                return True
+        return False
+
+    def _corral_deadlock(self, state, moved_box):
+        # Looks at the areas the player cannot enter that the pushed box now fences
+        board = self.static.board
+        boxes = state.box_bits
+        # Any such area holds a cell next to the pushed box
+        enclosed = board.floor & ~boxes & board.neighbours(board.bit(moved_box))
+        if enclosed:
+            enclosed &= ~state.reachable_bits()
+        while enclosed:
+            area = board.reachable(enclosed & -enclosed, boxes)
+            enclosed &= ~area
+            if self._corral_unsolvable(state, area, boxes & board.neighbours(area)):
+                return True
+        return False
+
+    def _corral_unsolvable(self, state, area, fence):
+        # Searches the pushes of the fence boxes alone, with every other box taken off the level. That only
+        # makes the level easier, so if no push sequence opens the corral to the player or puts all the
+        # fence boxes on goals, the full state is dead too
+        board = self.static.board
+        goals = board.goals
+        # A corral whose fence is on goals only matters when its empty goals have to be filled
+        needs_filling = area & goals and len(self.static.goals) == len(state.boxes)
+        if not fence & ~goals and not needs_filling:
+            return False
+        key = (fence, area, board.first_point(board.reachable(board.bit(state.player), fence)))
+        if key in self._corrals:
+            return self._corrals[key]
+        root = SearchState(self.static, state.player, frozenset(board.points_of(fence)), fence)
+        pushes = root.get_valid_pushes()
+        # Only corrals whose fence can be pushed inward and nowhere else are searched
+        unsolvable = all(board.bit(self._target(push)) & area for push in pushes) and \
+            not self._corral_opens(root, pushes, area)
+        if len(self._corrals) >= CORRAL_CACHE_SIZE:
+            self._corrals.clear()
+        self._corrals[key] = unsolvable
+        return unsolvable
+
+    def _corral_opens(self, root, pushes, area):
+        # Breadth-first push search; running out of budget counts as solvable
+        seen = {root.canonical_key()}
+        layer = [(root, pushes)]
+        nodes = 0
+        while layer:
+            next_layer = []
+            for state, pushes in layer:
+                for push in pushes:
+                    nodes += 1
+                    if nodes > CORRAL_MAX_NODES:
+                        return True
+                    child = state.pushed(push)
+                    if child.level_complete() or child.reachable_bits() & area:
+                        return True
+                    target = self._target(push)
+                    if target in self.dead_squares or self._freeze_deadlock(target, child.boxes):
+                        continue
+                    key = child.canonical_key()
+                    if key not in seen:
+                        seen.add(key)
+                        next_layer.append((child, child.get_valid_pushes()))
+            layer = next_layer
+        return False
+
+    @staticmethod
+    def _target(push):
+        (x, y), direction = push
+        x_diff, y_diff = direction.value
+        return x + x_diff, y + y_diff
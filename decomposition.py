@@ -0,0 +1,304 @@
+import itertools
+import multiprocessing
+import time
+from concurrent.futures import FIRST_EXCEPTION, ProcessPoolExecutor, wait
+
+from level_library import ParsedLevel
+from sokoban import Sokoban
+from state import OFFSETS, SearchState, StaticMap
+
+# Above this many groups only a few stitching orders are tried instead of all of them
+MAX_ORDERED_GROUPS = 5
+# Seconds between two looks at the cancel while the groups are searched in other processes
+CANCEL_POLL = 0.05
+# Search counts added up over the groups' searches
+COUNTS = ["nodes", "frontier", "generated", "deduplicated", "reopened"]
+
+# In a worker process: the EventCancellation the parent cancels when the solve is cancelled
+_stop = None
+
+
+def articulation_points(cells, start):
+    # Cells whose removal disconnects the walkable region around start (iterative Tarjan)
+    if start not in cells:
+        return frozenset()
+    order = {start: 0}
+    low = {start: 0}
+    points = set()
+    root_children = 0
+    stack = [(start, None, iter(OFFSETS))]
+    while stack:
+        cell, parent, neighbours = stack[-1]
+        for x_diff, y_diff in neighbours:
+            neighbour = (cell[0] + x_diff, cell[1] + y_diff)
+            if neighbour not in cells or neighbour == parent:
+                continue
+            if neighbour in order:
+                low[cell] = min(low[cell], order[neighbour])
+                continue
+            order[neighbour] = low[neighbour] = len(order)
+            stack.append((neighbour, cell, iter(OFFSETS)))
+            break
+        else:
+            stack.pop()
+            if parent is None:
+                continue
+            low[parent] = min(low[parent], low[cell])
+            if parent == start:
+                root_children += 1
+            elif low[cell] >= order[parent]:
+                points.add(parent)
+    if root_children > 1:
+        points.add(start)
+    return frozenset(points)
+
+
+def box_area(static: StaticMap, box):
+    # Cells this box could be pushed to if it were alone, with the player always able to get behind it
+    area = {box}
+    queue = [box]
+    for x, y in queue:
+        for x_diff, y_diff in OFFSETS:
+            target = (x + x_diff, y + y_diff)
+            if target not in area and target in static.floor and (x - x_diff, y - y_diff) in static.floor:
+                area.add(target)
+                queue.append(target)
+    return area
+
+
+class Decomposition:
+    """Boxes and goals of a level split into groups that never get in each other's way.
+
+    Each box is grouped with the goals it could be pushed onto, and two boxes share a
+    group when the cells they could ever be pushed over overlap or touch. Groups with
+    as many boxes as goals can be searched on their own; articulation points (the doors
+    and corridor cells of the walkable area) decide the order groups are stitched in:
+    groups whose goals sit in a doorway are finished last.
+    """
+
+    def __init__(self, static: StaticMap, player, boxes):
+        self.static = static
+        self.player = player
+        self.articulation_points = articulation_points(static.floor, player)
+        live = static.floor - (static.dead_squares or frozenset())
+        areas = {box: box_area(static, box) & live for box in boxes}
+        parents = {item: item for item in [("box", box) for box in boxes] + [("goal", goal) for goal in static.goals]}
+
+        def find(item):
+            while parents[item] != item:
+                parents[item] = parents[parents[item]]
+                item = parents[item]
+            return item
+
+        def union(first, second):
+            parents[find(first)] = find(second)
+
+        for box, area in areas.items():
+            for goal in static.goals & area:
+                union(("box", box), ("goal", goal))
+        for first, second in itertools.combinations(boxes, 2):
+            touching = {(x + x_diff, y + y_diff) for x, y in areas[first] for x_diff, y_diff in OFFSETS}
+            if touching & areas[second] or areas[first] & areas[second]:
+                union(("box", first), ("box", second))
+
+        groups = {}
+        for item in parents:
+            kind, point = item
+            groups.setdefault(find(item), (set(), set()))[0 if kind == "box" else 1].add(point)
+        self.groups = sorted(((frozenset(group_boxes), frozenset(group_goals))
+                              for group_boxes, group_goals in groups.values() if group_boxes or group_goals),
+                             key=lambda group: (bool(group[1] & self.articulation_points), min(group[1] | group[0])))
+
+    @property
+    def independent(self):
+        # More than one group, each with a goal for every box
+        return len(self.groups) > 1 and all(len(boxes) == len(goals) for boxes, goals in self.groups)
+
+    def orders(self):
+        # Group orders to try when stitching, the analysis order first
+        indices = list(range(len(self.groups)))
+        if len(indices) <= MAX_ORDERED_GROUPS:
+            return itertools.permutations(indices)
+        return [tuple(indices), tuple(reversed(indices))]
+
+    def subproblem(self, group, state: SearchState = None):
+        # The level drawn with only this group's boxes and goals. Without a state everything else is
+        # plain floor; with one, the player starts where it stands and the other boxes are walls
+        boxes, goals = group
+        player = self.player if state is None else state.player
+        walls = frozenset() if state is None else state.boxes - boxes
+        drawn = []
+        for y in range(self.static.height):
+            line = []
+            for x in range(self.static.width):
+                point = (x, y)
+                if point not in self.static.floor or point in walls:
+                    line.append("#")
+                elif point == player:
+                    line.append("+" if point in goals else "@")
+                elif point in boxes:
+                    line.append("*" if point in goals else "$")
+                else:
+                    line.append("." if point in goals else " ")
+            drawn.append("".join(line))
+        return tuple(drawn)
+
+
+def _watch_stop(stop):
+    global _stop
+    _stop = stop
+
+
+def _solve_subproblem(rows, algorithm_name, heuristic_name, options, cancel=None):
+    # Runs in a worker process; returns the status, the push actions and the search counts
+    from algorithms import SokobanSolver
+
+    if cancel is None:
+        cancel = _stop
+    solver = SokobanSolver(Sokoban.from_parsed(ParsedLevel(0, "", rows)))
+    result = solver.solve(algorithm_name, heuristic_name, mode="pushes", cancel=cancel, **options)
+    pushes = []
+    node = result.node
+    while node is not None and node.parent is not None:
+        box, direction = node.action
+        pushes.append((box, direction.value))
+        node = node.parent
+    pushes.reverse()
+    counts = {name: getattr(result, name) for name in COUNTS}
+    counts["pruned"] = result.pruned
+    return result.status, pushes, counts
+
+
+def _budget(options, deadline, max_nodes, counts, share=1):
+    # The time and nodes left of the whole solve, split between `share` searches running at once, as
+    # is memory_limit (each process measures its own memory)
+    budget = dict(options, time_limit=None if deadline is None else max(0.0, deadline - time.time()),
+                  max_nodes=None if max_nodes is None else max(0, max_nodes - counts["nodes"]) // share)
+    if share > 1 and budget.get("memory_limit") is not None:
+        budget["memory_limit"] /= share
+    return budget
+
+
+def _add_counts(counts, group_counts):
+    for name in COUNTS:
+        counts[name] += group_counts[name]
+    for rule, pruned in group_counts["pruned"].items():
+        counts["pruned"][rule] = counts["pruned"].get(rule, 0) + pruned
+
+
+def stitch(state: SearchState, pushes):
+    # Plays one group's pushes in the joint level, walking the player between them. Returns the moves
+    # and the state after the last push, or None when a push cannot be made there
+    moves = []
+    for box, offset in pushes:
+        direction = Sokoban.Direction(offset)
+        target = (box[0] + offset[0], box[1] + offset[1])
+        if box not in state.boxes or target in state.boxes or target not in state.static.floor:
+            return None
+        path = state.path_to((box[0] - offset[0], box[1] - offset[1]))
+        if path is None:
+            return None
+        moves.extend(path)
+        moves.append(direction)
+        state = state.pushed((box, direction))
+    return moves, state
+
+
+def _can_continue(state: SearchState, groups):
+    # The player must still reach a box of every group that is not finished yet
+    region = state.reachable()
+    for boxes, goals in groups:
+        left = (state.boxes & boxes) - goals
+        if left and not any((x + x_diff, y + y_diff) in region for x, y in left for x_diff, y_diff in OFFSETS):
+            return False
+    return True
+
+
+def _solve_in_processes(jobs, workers, cancel):
+    # The groups' searches over a process pool; a cancel is passed on, with its reason, through an
+    # EventCancellation they all watch
+    from algorithms import EventCancellation
+
+    stop = EventCancellation(multiprocessing.get_context())
+    with ProcessPoolExecutor(max_workers=min(workers, len(jobs)), initializer=_watch_stop,
+                             initargs=(stop,)) as executor:
+        futures = [executor.submit(_solve_subproblem, *job) for job in jobs]
+        while wait(futures, timeout=CANCEL_POLL, return_when=FIRST_EXCEPTION).not_done:
+            if cancel is not None and cancel.cancelled:
+                stop.cancel(cancel.reason)
+        return [future.result() for future in futures]
+
+
+def solve_decomposed(solver, algorithm_name, heuristic_name=None, workers=1, cancel=None, deadline=None,
+                     max_nodes=None, **options):
+    """Solves the independent groups of solver's level separately and stitches the pushes together.
+
+    The groups are first solved alone in "pushes" mode, in parallel processes when
+    workers > 1, and every group order is tried for stitching. When other groups' boxes
+    get in the player's way, the groups are solved again one after the other with those
+    boxes drawn as walls where they stand. options go to every subproblem's solve() and
+    cancel (a Cancellation) stops them all; the groups share one deadline (a time.time()
+    value) and max_nodes between them. Returns the moves, checked by replay, or None when
+    the level does not decompose, a group has no solution or the solve was cancelled or
+    ran out of budget (callers then search the whole level), together with the number of
+    groups and the search counts (COUNTS and pruned) added up over the groups.
+    """
+    counts = dict.fromkeys(COUNTS, 0)
+    counts["pruned"] = {}
+    initial_state = solver.initial_node.state
+    decomposition = Decomposition(solver.static_map, initial_state.player, initial_state.boxes)
+    if not decomposition.independent:
+        return None, 0, counts
+    if workers > 1:
+        budget = _budget(options, deadline, max_nodes, counts, min(workers, len(decomposition.groups)))
+        jobs = [(decomposition.subproblem(group), algorithm_name, heuristic_name, budget)
+                for group in decomposition.groups]
+        outcomes = _solve_in_processes(jobs, workers, cancel)
+    else:
+        outcomes = []
+        for group in decomposition.groups:
+            outcomes.append(_solve_subproblem(decomposition.subproblem(group), algorithm_name, heuristic_name,
+                                              _budget(options, deadline, max_nodes, counts), cancel))
+            _add_counts(counts, outcomes[-1][2])
+            if outcomes[-1][0] != "solved":
+                return None, len(decomposition.groups), counts
+    if workers > 1:
+        for _, _, group_counts in outcomes:
+            _add_counts(counts, group_counts)
+    if any(status != "solved" for status, _, _ in outcomes):
+        return None, len(decomposition.groups), counts
+
+    # Groups are played in turn; a group whose pushes do not fit the joint level, or that leaves
+    # the player cut off from a later group, is solved again with the other boxes as walls
+    in_context = {}
+    for order in decomposition.orders():
+        if cancel is not None and cancel.cancelled:
+            return None, len(decomposition.groups), counts
+        state = initial_state
+        moves = []
+        for position, index in enumerate(order):
+            group = decomposition.groups[index]
+            later = [decomposition.groups[other] for other in order[position + 1:]]
+            stitched = stitch(state, outcomes[index][1])
+            if stitched is None or not _can_continue(stitched[1], later):
+                key = (index, state.canonical_key())
+                if key not in in_context:
+                    status, pushes, group_counts = _solve_subproblem(decomposition.subproblem(group, state),
+                                                                     algorithm_name, heuristic_name,
+                                                                     _budget(options, deadline, max_nodes, counts),
+                                                                     cancel)
+                    _add_counts(counts, group_counts)
+                    in_context[key] = stitch(state, pushes) if status == "solved" else None
+                stitched = in_context[key]
+                if stitched is None or not _can_continue(stitched[1], later):
+                    break
+            moves.extend(stitched[0])
+            state = stitched[1]
+        else:
+            if state.level_complete():
+                break
+    else:
+        return None, len(decomposition.groups), counts
+    if not solver._replay(moves):
+        return None, len(decomposition.groups), counts
+    return moves, len(decomposition.groups), counts
@@ -0,0 +1,75 @@
+import heapq
+import itertools
+from time import perf_counter
+
+
+class PriorityFrontier:
+    """Binary heap frontier for best-first searches.
+
+    Entries are ordered by priority, then by h, then by insertion order, so ties are
+    broken deterministically. Priorities are computed once when a node is pushed;
+    stale entries are left in the heap and skipped by the caller when popped.
+    """
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    def push(self, node, priority, h):
+        heapq.heappush(self._heap, (priority, h, next(self._counter), node))
+
+    def pop(self):
+        return heapq.heappop(self._heap)[-1]
+
+    def pop_entry(self):
+        # (node, h) of the next entry
+        _, h, _, node = heapq.heappop(self._heap)
+        return node, h
+
+    def entries(self):
+        return ((node, h) for _, h, _, node in self._heap)
+
+    def reprioritize(self, priority_fn):
+        # Recomputes every priority as priority_fn(node, h), e.g. after a change of weight
+        self._heap = [(priority_fn(node, h), h, count, node) for _, h, count, node in self._heap]
+        heapq.heapify(self._heap)
+
+    def peek_priority(self):
+        # Priority of the next entry, or None when empty
+        return self._heap[0][0] if self._heap else None
+
+
+class TimedFrontier(PriorityFrontier):
+    """PriorityFrontier that adds the time spent in push and pop to timings["frontier"]."""
+
+    def __init__(self, timings):
+        super().__init__()
+        self.timings = timings
+
+    def push(self, node, priority, h):
+        start = perf_counter()
+        super().push(node, priority, h)
+        self.timings["frontier"] += perf_counter() - start
+
+    def pop(self):
+        start = perf_counter()
+        node = super().pop()
+        self.timings["frontier"] += perf_counter() - start
+        return node
+
+    def pop_entry(self):
+        start = perf_counter()
+        entry = super().pop_entry()
+        self.timings["frontier"] += perf_counter() - start
+        return entry
+
+    def reprioritize(self, priority_fn):
+        start = perf_counter()
+        super().reprioritize(priority_fn)
+        self.timings["frontier"] += perf_counter() - start
@@ -0,0 +1,309 @@
+import multiprocessing
+import queue
+import time
+
+from deadlock import DeadlockDetector
+from frontier import PriorityFrontier
+from metrics import current_rss_mb
+from state import UNREACHABLE, SearchState
+from transposition import TranspositionTable
+
+# Children bound for another worker are sent once this many are waiting
+HDA_BATCH_SIZE = 128
+# Expansions between two looks at the inbox
+HDA_STEP = 64
+# Seconds an idle worker (or the coordinator) waits for a message before checking again
+HDA_WAIT = 0.02
+
+
+def owner(key, workers):
+    # Keys are built from ints only, so their hash is the same in every process
+    return hash(key) % workers
+
+
+class HdaWorker:
+    """One HDA* worker: an A* over the states whose key hashes to it.
+
+    Children are sent to the worker owning their key, in batches, as
+    (key, player, g, h, parent ref, action) items. Each worker keeps its own open list
+    and best-g table and only records, per key, the (worker, serial) reference of the
+    parent and the action, so a solution path is traced back across workers at the end.
+    """
+
+    def __init__(self, worker_id, workers, sokoban, mode, heuristic_name, rules, inboxes, results):
+        from algorithms import SokobanSolver
+
+        self.worker_id = worker_id
+        self.workers = workers
+        self.solver = SokobanSolver(sokoban)
+        self.solver.mode = mode
+        self.solver.deadlocks = DeadlockDetector(self.solver.static_map, rules)
+        heuristic_fn = self.solver._get_heuristic(heuristic_name)
+        self.node_h = self.solver._node_heuristic(heuristic_fn)
+        # Popped nodes have no parent here, so incremental heuristics rebuild their aggregate once per expansion
+        self.incremental = heuristic_fn in self.solver._get_incremental_heuristics()
+        self.closed = TranspositionTable(lambda key: key, reopen=True)
+        self.frontier = PriorityFrontier()
+        self.keys = []  # serial -> key
+        self.links = {}  # key -> (serial, parent ref, action) of the cheapest path seen
+        self.outboxes = [[] for _ in range(workers)]
+        self.inboxes = inboxes
+        self.results = results
+        # Cost of the best solution found by any worker
+        self.incumbent = UNREACHABLE
+        self.sent = 0
+        self.received = 0
+        self.stopped = False
+
+    def _has_work(self):
+        priority = self.frontier.peek_priority()
+        return priority is not None and priority < self.incumbent
+
+    def _admit(self, item):
+        key, player, g, h, parent_ref, action = item
+        if not self.closed.admit(key, g):
+            return
+        if h is None:
+            h = self.node_h(self.solver.TreeNode(SearchState(self.solver.static_map, player, key[1])))
+        if g + h >= self.incumbent:
+            return
+        if key in self.links:
+            serial = self.links[key][0]
+        else:
+            serial = len(self.keys)
+            self.keys.append(key)
+        self.links[key] = (serial, parent_ref, action)
+        self.frontier.push((player, key, g), g + h, h)
+
+    def _send(self, worker_id):
+        if self.outboxes[worker_id]:
+            self.inboxes[worker_id].put(("nodes", self.outboxes[worker_id]))
+            self.outboxes[worker_id] = []
+            self.sent += 1
+
+    def _step(self):
+        solver = self.solver
+        for _ in range(HDA_STEP):
+            if not self._has_work():
+                return
+            player, key, g = self.frontier.pop()
+            if self.closed.is_stale(key, g):
+                continue
+            state = SearchState(solver.static_map, player, key[1])
+            if state.level_complete():
+                if g < self.incumbent:
+                    self.incumbent = g
+                    self.results.put(("solution", g, (self.worker_id, self.links[key][0])))
+                continue
+            node = solver.TreeNode(state, None, None, g)
+            if self.incremental:
+                self.node_h(node)
+            ref = (self.worker_id, self.links[key][0])
+            for child in solver._expand(node):
+                # Incremental heuristics need the parent, so they are evaluated here; the others are left
+                # to the owner, which skips duplicates first
+                h = self.node_h(child) if self.incremental else None
+                if h is not None and child.depth + h >= self.incumbent:
+                    continue
+                child_key = solver._state_key(child.state)
+                item = (child_key, child.state.player, child.depth, h, ref, child.action)
+                destination = owner(child_key, self.workers)
+                if destination == self.worker_id:
+                    self._admit(item)
+                else:
+                    self.outboxes[destination].append(item)
+                    if len(self.outboxes[destination]) >= HDA_BATCH_SIZE:
+                        self._send(destination)
+
+    def _handle(self, message):
+        kind = message[0]
+        if kind == "nodes":
+            self.received += 1
+            for item in message[1]:
+                self._admit(item)
+        elif kind == "incumbent":
+            if message[1] < self.incumbent:
+                self.incumbent = message[1]
+        elif kind == "trace":
+            _, parent_ref, action = self.links[self.keys[message[1]]]
+            self.results.put(("parent", parent_ref, action))
+        elif kind == "stop":
+            self.stopped = True
+
+    def _status(self):
+        solver = self.solver
+        return ("status", self.worker_id, self.sent, self.received, not self._has_work(), solver.expanded,
+                len(self.frontier), self.closed.generated, self.closed.duplicates, self.closed.reopened,
+                current_rss_mb() or 0)
+
+    def run(self):
+        inbox = self.inboxes[self.worker_id]
+        while not self.stopped:
+            try:
+                message = inbox.get(timeout=HDA_WAIT) if not self._has_work() else inbox.get_nowait()
+                while True:
+                    self._handle(message)
+                    message = inbox.get_nowait()
+            except queue.Empty:
+                pass
+            if self.stopped:
+                break
+            self._step()
+            for worker_id in range(self.workers):
+                self._send(worker_id)
+            self.results.put(self._status())
+        self.results.put(("done", self.worker_id, dict(self.solver.deadlocks.pruned)))
+
+
+def _run_worker(*args):
+    HdaWorker(*args).run()
+
+
+class HdaResult:
+    def __init__(self):
+        self.status = "no_solution"
+        self.cost = 0
+        self.actions = None
+        self.expanded = 0
+        self.frontier = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.reopened = 0
+        self.pruned = {}
+
+
+def run_hda_star(sokoban, initial_key, initial_player, mode, heuristic_name, rules, workers,
+                 max_nodes=None, deadline=None, memory_limit=None, cancel=None):
+    """Hash-distributed A* over `workers` processes.
+
+    Stops when every worker is idle (nothing left below the incumbent cost) and no
+    batch is in flight, which is detected by two consecutive rounds of status reports
+    with the same, matching sent and received counts. With an admissible heuristic
+    the incumbent is then optimal. memory_limit (MB) bounds the resident memory of the
+    coordinator and the workers together, as last reported; cancel is a Cancellation
+    whose reason becomes the status. The deadline and cancel also bound the trace of the
+    solution path, and a worker that dies raises a RuntimeError instead of a hang.
+    """
+    context = multiprocessing.get_context()
+    inboxes = [context.Queue() for _ in range(workers)]
+    results = context.Queue()
+    processes = [context.Process(target=_run_worker, daemon=True,
+                                 args=(worker_id, workers, sokoban, mode, heuristic_name, rules, inboxes, results))
+                 for worker_id in range(workers)]
+    for process in processes:
+        process.start()
+
+    result = HdaResult()
+    reports = {}
+    fresh = set()
+    previous_totals = None
+    best_ref = None
+    inboxes[owner(initial_key, workers)].put(("nodes", [(initial_key, initial_player, 0, None, None, None)]))
+    coordinator_sent = 1
+    try:
+        while True:
+            if max_nodes is not None and result.expanded > max_nodes:
+                result.status = "node_limit"
+                break
+            if memory_limit is not None and (current_rss_mb() or 0) + sum(
+                    report[8] for report in reports.values()) > memory_limit:
+                result.status = "memory_limit"
+                break
+            status = _stop_status(processes, deadline, cancel)
+            if status is not None:
+                result.status = status
+                break
+            try:
+                message = results.get(timeout=HDA_WAIT)
+            except queue.Empty:
+                continue
+
+            if message[0] == "solution":
+                _, cost, ref = message
+                if best_ref is None or cost < result.cost:
+                    result.cost = cost
+                    best_ref = ref
+                    for inbox in inboxes:
+                        inbox.put(("incumbent", cost))
+            elif message[0] == "status":
+                reports[message[1]] = message[2:]
+                fresh.add(message[1])
+                result.expanded = sum(report[3] for report in reports.values())
+                if len(fresh) == workers:
+                    fresh.clear()
+                    sent = coordinator_sent + sum(report[0] for report in reports.values())
+                    received = sum(report[1] for report in reports.values())
+                    idle = all(report[2] for report in reports.values())
+                    totals = (sent, received) if idle and sent == received else None
+                    if totals is not None and totals == previous_totals:
+                        break
+                    previous_totals = totals
+
+        if best_ref is not None and result.status == "no_solution":
+            result.status, result.actions = _trace(best_ref, inboxes, results, processes, deadline, cancel)
+    finally:
+        for inbox in inboxes:
+            inbox.put(("stop",))
+        _collect(result, processes, reports, results, workers)
+    return result
+
+
+def _stop_status(processes, deadline, cancel):
+    # The status the coordinator stops with, or None to go on; a worker that died (killed for memory,
+    # or an error in its search) would never answer again
+    if deadline is not None and time.time() > deadline:
+        return "time_limit"
+    if cancel is not None and cancel.reason is not None:
+        return cancel.reason
+    if any(not process.is_alive() for process in processes):
+        raise RuntimeError("HDA* worker stopped unexpectedly")
+    return None
+
+
+def _trace(ref, inboxes, results, processes, deadline=None, cancel=None):
+    # Follows the parent references back to the start, one worker round trip per step. Returns "solved"
+    # and the actions, or the status that cut the trace short and None
+    actions = []
+    while ref is not None:
+        worker_id, serial = ref
+        inboxes[worker_id].put(("trace", serial))
+        message = None
+        while message is None or message[0] != "parent":
+            status = _stop_status(processes, deadline, cancel)
+            if status is not None:
+                return status, None
+            try:
+                message = results.get(timeout=HDA_WAIT)
+            except queue.Empty:
+                message = None
+        _, ref, action = message
+        if ref is not None:
+            actions.append(action)
+    actions.reverse()
+    return "solved", actions
+
+
+def _collect(result, processes, reports, results, workers):
+    done = 0
+    while done < workers:
+        try:
+            message = results.get(timeout=HDA_WAIT)
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+            continue
+        if message[0] == "status":
+            reports[message[1]] = message[2:]
+        elif message[0] == "done":
+            done += 1
+            for rule, count in message[2].items():
+                result.pruned[rule] = result.pruned.get(rule, 0) + count
+    for process in processes:
+        process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+    result.expanded = sum(report[3] for report in reports.values())
+    result.frontier = sum(report[4] for report in reports.values())
+    result.generated = sum(report[5] for report in reports.values())
+    result.duplicates = sum(report[6] for report in reports.values())
+    result.reopened = sum(report[7] for report in reports.values())
@@ -0,0 +1,93 @@
+from state import OFFSETS, StaticMap
+
+
+class IncrementalHeuristic:
+    """Heuristic kept as a cached aggregate of per-box terms.
+
+    initial() builds the aggregate for a whole state. update() derives a child's
+    aggregate from its parent's when one box moved from `old` to `new`, touching only
+    the cells around the move. value() turns an aggregate into the heuristic value.
+    """
+
+    def initial(self, state):
+        raise NotImplementedError
+
+    def update(self, aggregate, parent, child, old, new):
+        raise NotImplementedError
+
+    def value(self, aggregate, state):
+        return aggregate
+
+
+class CellTableHeuristic(IncrementalHeuristic):
+    # Sum of a fixed per-cell value over the boxes (manhattan_boxes, grid)
+
+    def __init__(self, table):
+        self.table = table
+
+    def initial(self, state):
+        return sum(self.table[box] for box in state.get_boxes())
+
+    def update(self, aggregate, parent, child, old, new):
+        return aggregate - self.table[old] + self.table[new]
+
+
+class FreedomDegreesHeuristic(IncrementalHeuristic):
+    # Aggregate is the number of blocked sides summed over all boxes
+
+    def __init__(self, static: StaticMap):
+        self.static = static
+
+    def _blocked_sides(self, box, boxes):
+        # Same rule as SokobanSolver._heuristic_freedom_degrees: walls and boxes off a goal block
+        floor = self.static.floor
+        goals = self.static.goals
+        x, y = box
+        blocked = 0
+        for x_diff, y_diff in OFFSETS:
+            point = (x + x_diff, y + y_diff)
+            if point not in floor or (point in boxes and point not in goals):
+                blocked += 1
+        return blocked
+
+    def initial(self, state):
+        boxes = state.get_boxes()
+        return sum(self._blocked_sides(box, boxes) for box in boxes)
+
+    def update(self, aggregate, parent, child, old, new):
+        # Only the moved box and its old and new neighbours can change their count
+        affected = {old, new}
+        for x, y in (old, new):
+            for x_diff, y_diff in OFFSETS:
+                affected.add((x + x_diff, y + y_diff))
+        for box in affected:
+            if box in parent.boxes:
+                aggregate -= self._blocked_sides(box, parent.boxes)
+            if box in child.boxes:
+                aggregate += self._blocked_sides(box, child.boxes)
+        return aggregate
+
+    def value(self, aggregate, state):
+        return (aggregate / len(state.get_boxes())) / 4
+
+
+class CombinedHeuristic(IncrementalHeuristic):
+    # manhattan_boxes + manhattan_player + freedom_degrees; the player term depends on every
+    # box and is recomputed from scratch
+
+    def __init__(self, manhattan_boxes, freedom_degrees, player_fn):
+        self.manhattan_boxes = manhattan_boxes
+        self.freedom_degrees = freedom_degrees
+        self.player_fn = player_fn
+
+    def initial(self, state):
+        return (self.manhattan_boxes.initial(state), self.freedom_degrees.initial(state))
+
+    def update(self, aggregate, parent, child, old, new):
+        manhattan, freedom = aggregate
+        return (self.manhattan_boxes.update(manhattan, parent, child, old, new),
+                self.freedom_degrees.update(freedom, parent, child, old, new))
+
+    def value(self, aggregate, state):
+        manhattan, freedom = aggregate
+        return manhattan + self.player_fn(state) + self.freedom_degrees.value(freedom, state)
@@ -0,0 +1,169 @@
+import mmap
+import os
+import re
+from typing import Dict, FrozenSet, List, Tuple
+
+from bitboard import BitboardLevel
+
+Point = Tuple[int, int]
+
+VALID_CHARACTERS = frozenset("# .$*@+")
+# .xsb/.sok collections may also draw floor as '-' or '_'
+FLOOR_ALIASES = {"-": " ", "_": " "}
+BOARD_CHARACTERS = VALID_CHARACTERS | frozenset(FLOOR_ALIASES)
+
+_HEADER = re.compile(rb"^Level (\d+)$")
+
+
+class ParsedLevel:
+    """A level's rows and the positions found while parsing them, shared by all its games."""
+
+    def __init__(self, number: int, title: str, rows: Tuple[str, ...]):
+        self.number = number
+        self.title = title
+        self.rows = rows
+        boxes = set()
+        goals = set()
+        player = None
+        for y, row in enumerate(rows):
+            for x, c in enumerate(row):
+                if c not in VALID_CHARACTERS:
+                    raise RuntimeError(f"ERROR: Level {number} has invalid value {c}")
+                point = (x, y)
+                if c in "$*":
+                    boxes.add(point)
+                if c in ".*+":
+                    goals.add(point)
+                if c in "@+":
+                    player = point
+        self.boxes: FrozenSet[Point] = frozenset(boxes)
+        self.goals: FrozenSet[Point] = frozenset(goals)
+        self.player = player
+        self._board = None
+
+    def board(self) -> BitboardLevel:
+        # Built on first use; every game of the level shares it
+        if self._board is None:
+            floor = [(x, y) for y, row in enumerate(self.rows) for x, c in enumerate(row) if c != "#"]
+            width = max((len(row) for row in self.rows), default=0)
+            self._board = BitboardLevel(width, len(self.rows), floor, self.goals)
+        return self._board
+
+
+def _is_board_line(line: bytes) -> bool:
+    text = line.decode(errors="replace")
+    return "#" in text and all(c in BOARD_CHARACTERS for c in text)
+
+
+class LevelLibrary:
+    """Index of one or more level files, parsed lazily.
+
+    Each file is scanned once (through mmap) to record the byte range of every level.
+    A level is only decoded and validated the first time it is requested. Supported
+    layouts are levels.txt ("Level N" header, then rows up to a blank line) and
+    .xsb/.sok collections (boards separated by non-board lines, numbered in order,
+    optionally followed by a "Title:" line).
+    """
+
+    _shared: Dict[str, "LevelLibrary"] = {}
+
+    def __init__(self, *levels_files: str):
+        self.files: List[str] = list(levels_files)
+        self._index: Dict[Tuple[str, int], Tuple[str, int, int, bool]] = {}
+        self._parsed: Dict[Tuple[str, int], ParsedLevel] = {}
+        self._static_maps = {}
+        self._last_added = None
+        for levels_file in self.files:
+            self._index_file(levels_file)
+
+    @classmethod
+    def shared(cls, levels_file: str) -> "LevelLibrary":
+        # One library per file and process, so repeated Sokoban(level, file) calls skip the scan
+        path = os.path.abspath(levels_file)
+        if path not in cls._shared:
+            cls._shared[path] = cls(levels_file)
+        return cls._shared[path]
+
+    def _index_file(self, levels_file: str):
+        with open(levels_file, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                count = 0
+                block = None  # [number, start, end, has_header]
+                while True:
+                    offset = data.tell()
+                    raw = data.readline()
+                    if not raw:
+                        break
+                    line = raw.rstrip(b"\r\n")
+                    if block is not None:
+                        # Headed levels run to the first blank line, others to the first non-board line
+                        if line.strip() and (block[3] or _is_board_line(line)):
+                            block[2] = data.tell()
+                            continue
+                        self._add(levels_file, block, "")
+                        block = None
+                    match = _HEADER.match(line.strip())
+                    if match:
+                        count += 1
+                        block = [int(match.group(1)), data.tell(), data.tell(), True]
+                    elif line.startswith(b"Title:") and count:
+                        self._retitle(levels_file, line[len(b"Title:"):].strip().decode(errors="replace"))
+                    elif _is_board_line(line):
+                        count += 1
+                        block = [count, offset, data.tell(), False]
+                if block is not None:
+                    self._add(levels_file, block, "")
+
+    def _add(self, levels_file, block, title):
+        number, start, end, has_header = block
+        self._index[(levels_file, number)] = (title, start, end, has_header)
+        self._last_added = (levels_file, number)
+
+    def _retitle(self, levels_file, title):
+        # "Title:" lines name the level drawn just above them
+        key = self._last_added
+        if key is not None and key[0] == levels_file:
+            _, start, end, has_header = self._index[key]
+            self._index[key] = (title, start, end, has_header)
+
+    def levels(self, levels_file: str = None) -> List[int]:
+        levels_file = levels_file or self.files[0]
+        return sorted(number for file, number in self._index if file == levels_file)
+
+    def __len__(self):
+        return len(self._index)
+
+    def get(self, level: int, levels_file: str = None) -> ParsedLevel:
+        levels_file = levels_file or self.files[0]
+        key = (levels_file, level)
+        if key not in self._parsed:
+            if key not in self._index:
+                raise RuntimeError(f"ERROR: Level {level} does not exist in {levels_file}")
+            title, start, end, _ = self._index[key]
+            with open(levels_file, "rb") as file:
+                file.seek(start)
+                text = file.read(end - start).decode()
+            rows = []
+            for line in text.split("\n"):
+                line = line.rstrip("\r")
+                if line.strip():
+                    for alias, floor in FLOOR_ALIASES.items():
+                        line = line.replace(alias, floor)
+                    rows.append(line)
+            self._parsed[key] = ParsedLevel(level, title, tuple(rows))
+        return self._parsed[key]
+
+    def static_map(self, level: int, levels_file: str = None):
+        from state import StaticMap
+
+        key = (levels_file or self.files[0], level)
+        if key not in self._static_maps:
+            self._static_maps[key] = StaticMap(self.new_game(level, levels_file))
+        return self._static_maps[key]
+
+    def new_game(self, level: int, levels_file: str = None):
+        from sokoban import Sokoban
+
+        return Sokoban.from_parsed(self.get(level, levels_file))
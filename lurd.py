@@ -0,0 +1,32 @@
+from sokoban import Sokoban
+
+# Standard solution notation: lowercase letters walk, uppercase letters push a box
+LURD_LETTERS = {
+    Sokoban.Direction.LEFT: "l",
+    Sokoban.Direction.RIGHT: "r",
+    Sokoban.Direction.UP: "u",
+    Sokoban.Direction.DOWN: "d",
+}
+_DIRECTIONS_BY_LETTER = {letter: direction for direction, letter in LURD_LETTERS.items()}
+
+
+def to_lurd(state, moves) -> str:
+    # state is the SearchState the moves start from; it tells walks and pushes apart
+    letters = []
+    for direction in moves:
+        x, y = state.player
+        x_diff, y_diff = direction.value
+        letter = LURD_LETTERS[direction]
+        letters.append(letter.upper() if (x + x_diff, y + y_diff) in state.boxes else letter)
+        state = state.moved(direction)
+    return "".join(letters)
+
+
+def from_lurd(text: str):
+    moves = []
+    for letter in text.strip():
+        direction = _DIRECTIONS_BY_LETTER.get(letter.lower())
+        if direction is None:
+            raise ValueError(f"Invalid LURD character {letter}")
+        moves.append(direction)
+    return moves
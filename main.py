@@ -1,5 +1,6 @@
 from algorithms import SokobanSolver
 from sokoban import Sokoban
+from solution_cache import SolutionCache
 
 
 def main():
@@ -15,7 +16,8 @@ def main():
     heuristic_name = "grid"  # Choose the algorithm: "manhattan_boxes", "manhattan_player", "freedom_degrees", "combined", "grid"
     max_depth = 4000  # Set the maximum depth for IDDFS (ignored for other algorithms)
 
-    sokobanSolver = SokobanSolver(initial_sokoban)
+    # Solutions and level tables are kept in .sokoban_cache, so later runs only replay them
+    sokobanSolver = SokobanSolver(initial_sokoban, cache=SolutionCache())
 
     #sokobanSolver.play_sokoban_with_algorithm(algorithm_name, heuristic_name, max_depth)
 
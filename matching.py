@@ -0,0 +1,71 @@
+from state import UNREACHABLE
+
+# Above this many boxes the O(n^3) assignment costs more than it saves
+MATCHING_MAX_BOXES = 20
+
+# Finite stand-in for UNREACHABLE inside the assignment, large enough to never be chosen when avoidable
+_FORBIDDEN = 1 << 30
+
+
+def min_cost_matching(costs):
+    """Minimum total cost of assigning each row (box) to a distinct column (goal).
+
+    Hungarian algorithm with potentials, O(n^2 m) for n rows and m >= n columns.
+    Returns UNREACHABLE when no assignment avoids an UNREACHABLE cell.
+    """
+    n = len(costs)
+    if n == 0:
+        return 0
+    m = len(costs[0])
+    if n > m:
+        return UNREACHABLE
+
+    u = [0] * (n + 1)
+    v = [0] * (m + 1)
+    assigned_row = [0] * (m + 1)
+    way = [0] * (m + 1)
+    for row in range(1, n + 1):
+        assigned_row[0] = row
+        column = 0
+        min_slack = [float("inf")] * (m + 1)
+        used = [False] * (m + 1)
+        while True:
+            used[column] = True
+            current_row = assigned_row[column]
+            delta = float("inf")
+            next_column = 0
+            row_costs = costs[current_row - 1]
+            for j in range(1, m + 1):
+                if not used[j]:
+                    cost = row_costs[j - 1]
+                    if cost == UNREACHABLE:
+                        cost = _FORBIDDEN
+                    slack = cost - u[current_row] - v[j]
+                    if slack < min_slack[j]:
+                        min_slack[j] = slack
+                        way[j] = column
+                    if min_slack[j] < delta:
+                        delta = min_slack[j]
+                        next_column = j
+            for j in range(m + 1):
+                if used[j]:
+                    u[assigned_row[j]] += delta
+                    v[j] -= delta
+                else:
+                    min_slack[j] -= delta
+            column = next_column
+            if assigned_row[column] == 0:
+                break
+        while column:
+            previous = way[column]
+            assigned_row[column] = assigned_row[previous]
+            column = previous
+
+    total = 0
+    for j in range(1, m + 1):
+        if assigned_row[j]:
+            cost = costs[assigned_row[j] - 1][j - 1]
+            if cost == UNREACHABLE:
+                return UNREACHABLE
+            total += cost
+    return total
@@ -0,0 +1,206 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tracemalloc
+from time import perf_counter
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# Comma separated "cpu" and/or "memory": profiles every search without touching the code
+PROFILE_ENV = "SOKOBAN_PROFILE"
+PROFILE_MODES = ["cpu", "memory"]
+# Expansions between two looks at the clock for progress samples, and at the resident memory
+SAMPLE_EVERY = 256
+# Lines kept from the cProfile and tracemalloc reports
+PROFILE_LINES = 25
+
+
+def peak_rss_mb():
+    # Peak of the whole process since it started, not of any one search
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def current_rss_mb():
+    # Resident memory right now on Linux; elsewhere the peak so far
+    try:
+        with open("/proc/self/statm") as file:
+            pages = int(file.read().split()[1])
+        return round(pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_rss_mb()
+
+
+def profile_modes(profile):
+    # profile=None falls back to the environment variable
+    if profile is None:
+        profile = os.environ.get(PROFILE_ENV, "")
+    if isinstance(profile, str):
+        profile = [mode.strip() for mode in profile.split(",") if mode.strip()]
+    modes = set(profile)
+    for mode in modes:
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Invalid profile mode {mode}")
+    return modes
+
+
+class SearchMetrics:
+    """What one search did and where its time went.
+
+    Node counters are filled in by the solver. timings holds the seconds spent in
+    successor generation, heuristic evaluation and heap frontier operations (the
+    FIFO/LIFO frontiers of BFS and DFS are not timed). samples holds
+    (elapsed seconds, expanded nodes, frontier size, nodes/sec since the previous
+    sample) tuples taken every sample_interval seconds, and progress, when given, is
+    called with this object after each sample. rss_mb is the resident memory last read
+    (every SAMPLE_EVERY expansions) and peak_rss_mb the highest value read during this
+    search, so solves run one after the other in a process each report their own.
+    """
+
+    def __init__(self, progress=None, sample_interval=1.0):
+        self.expanded = 0
+        self.generated = 0
+        self.deduplicated = 0
+        self.reopened = 0
+        self.pruned = {}
+        self.peak_frontier = 0
+        self.rss_mb = None
+        self.peak_rss_mb = None
+        self.wall_time = 0.0
+        self.timings = {"successors": 0.0, "heuristic": 0.0, "frontier": 0.0}
+        self.samples = []
+        self.progress = progress
+        self.sample_interval = sample_interval
+        # Reports of the opt-in profiling modes
+        self.cpu_profile = None
+        self.memory_profile = None
+        self._frontiers = ()
+        self.start()
+
+    def start(self):
+        self._start = perf_counter()
+        self._next_sample = self._start + self.sample_interval
+        self._last_sample = (0.0, self.expanded)
+        self.peak_rss_mb = None
+        self.sample_memory()
+
+    def elapsed(self):
+        return perf_counter() - self._start
+
+    def watch(self, *frontiers):
+        # The containers whose total size is the frontier size of the running search
+        self._frontiers = frontiers
+
+    def frontier_size(self):
+        size = 0
+        for frontier in self._frontiers:
+            size += len(frontier)
+        return size
+
+    def on_expand(self, expanded):
+        self.expanded = expanded
+        size = self.frontier_size()
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+        if expanded % SAMPLE_EVERY == 0:
+            self.sample_memory()
+            if perf_counter() >= self._next_sample:
+                self.sample()
+
+    def sample_memory(self):
+        self.rss_mb = current_rss_mb()
+        if self.rss_mb is not None and (self.peak_rss_mb is None or self.rss_mb > self.peak_rss_mb):
+            self.peak_rss_mb = self.rss_mb
+        return self.rss_mb
+
+    def sample(self):
+        elapsed = self.elapsed()
+        last_elapsed, last_expanded = self._last_sample
+        rate = (self.expanded - last_expanded) / (elapsed - last_elapsed) if elapsed > last_elapsed else 0.0
+        self.samples.append((round(elapsed, 3), self.expanded, self.frontier_size(), round(rate, 1)))
+        self._last_sample = (elapsed, self.expanded)
+        self._next_sample = perf_counter() + self.sample_interval
+        if self.progress is not None:
+            self.progress(self)
+
+    def timed(self, fn, category):
+        # Wraps fn so the time spent in it is added to timings[category]
+        timings = self.timings
+
+        def timed_fn(*args):
+            start = perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                timings[category] += perf_counter() - start
+        return timed_fn
+
+    def finish(self):
+        self.wall_time = self.elapsed()
+        self.sample_memory()
+        self._frontiers = ()
+
+    @property
+    def nodes_per_second(self):
+        return self.expanded / self.wall_time if self.wall_time else 0.0
+
+    def to_dict(self):
+        return {
+            "expanded": self.expanded,
+            "generated": self.generated,
+            "deduplicated": self.deduplicated,
+            "reopened": self.reopened,
+            "pruned": dict(self.pruned),
+            "peak_frontier": self.peak_frontier,
+            "peak_rss_mb": self.peak_rss_mb,
+            "wall_time": round(self.wall_time, 4),
+            "nodes_per_second": round(self.nodes_per_second, 1),
+            "timings": {category: round(seconds, 4) for category, seconds in self.timings.items()},
+            "samples": list(self.samples),
+        }
+
+
+class Profiling:
+    """Context manager running cProfile and/or tracemalloc around a search.
+
+    The reports are stored as text on the metrics object when the block exits.
+    """
+
+    def __init__(self, metrics, modes):
+        self.metrics = metrics
+        self.modes = modes
+        self.profiler = None
+        self.started_tracemalloc = False
+
+    def __enter__(self):
+        if "memory" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+        if "cpu" in self.modes:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.profiler is not None:
+            self.profiler.disable()
+            output = io.StringIO()
+            pstats.Stats(self.profiler, stream=output).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            self.metrics.cpu_profile = output.getvalue()
+        if "memory" in self.modes and tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            lines = [f"peak traced memory: {peak / (1024 * 1024):.1f} MB"]
+            lines.extend(str(stat) for stat in snapshot.statistics("lineno")[:PROFILE_LINES])
+            self.metrics.memory_profile = "\n".join(lines)
+            if self.started_tracemalloc:
+                tracemalloc.stop()
+        return False
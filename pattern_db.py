@@ -0,0 +1,248 @@
+import argparse
+import itertools
+import mmap
+import os
+import struct
+import tempfile
+from math import comb
+
+from cli import parse_levels
+from solution_cache import CACHE_DIR_ENV, DEFAULT_CACHE_DIR, static_fingerprint
+from sokoban import Sokoban
+from state import UNREACHABLE, StaticMap, goal_roots
+
+# Boxes per pattern. Pair tables grow with the square of the live cells: levels 1-41 build in about a
+# second or less, the 200-500 cell levels with dozens of boxes take 3-30 seconds; triples grow with the cube
+PATTERN_SIZE = 2
+# Above this many boxes the pattern_db heuristics use matching alone: every state would cost C(boxes, size)
+# lookups, and those levels have the largest tables
+PATTERN_MAX_BOXES = 20
+# Table entries are bytes; costs above MAX_COST are stored as MAX_COST, which keeps them lower bounds
+MAX_COST = 254
+_UNSOLVABLE = 255
+# Placements pulled between two calls to a build's should_stop
+STOP_CHECK_EVERY = 1024
+_MAGIC = b"SKPDB1"
+_HEADER = struct.Struct("<6sHH")
+
+
+class PatternDatabase:
+    """Exact push costs of every placement of `size` boxes alone on the level.
+
+    Built by a retrograde pull search from every way to put `size` boxes on goals,
+    so an entry is the fewest pushes that bring those boxes onto some goals,
+    ignoring the other boxes (and taking the best player position). Entries are
+    indexed by the combinatorial rank of the sorted cells, over the cells a box can
+    still reach a goal from; singles holds the same costs for one box per cell. Both
+    are bytes-like objects, usually views of a read-only mmap of the file written by
+    save().
+
+    Two lookups combine the entries into an admissible estimate for a whole state:
+    additive() sums the entries of disjoint groups of boxes (every push moves one box),
+    and maximum() takes the largest entry over all groups.
+    """
+
+    def __init__(self, static: StaticMap, size, cells, singles, table):
+        self.static = static
+        self.size = size
+        self.cells = cells
+        self.singles = [UNREACHABLE if cost == _UNSOLVABLE else cost for cost in singles]
+        self.table = table
+        self.rank_of = {cell: rank for rank, cell in enumerate(cells)}
+        self.offsets = rank_offsets(len(cells), size)
+
+    def lookup(self, ranks):
+        # Pushes for the boxes on the cells of these ranks, sorted ascending
+        index = 0
+        for offsets, rank in zip(self.offsets, ranks):
+            index += offsets[rank]
+        cost = self.table[index]
+        return UNREACHABLE if cost == _UNSOLVABLE else cost
+
+    def _ranks(self, boxes):
+        ranks = []
+        for box in boxes:
+            rank = self.rank_of.get(box)
+            if rank is None:
+                return None
+            ranks.append(rank)
+        ranks.sort()
+        return ranks
+
+    def additive(self, boxes):
+        # Every box starts alone at its single-box cost; groups whose entry beats the sum of their
+        # singles are taken greedily, largest gain first, without sharing boxes
+        ranks = self._ranks(boxes)
+        if ranks is None:
+            return UNREACHABLE
+        singles = self.singles
+        total = sum(singles[rank] for rank in ranks)
+        if len(ranks) < self.size or total >= UNREACHABLE:
+            return min(total, UNREACHABLE)
+        gains = []
+        for group in itertools.combinations(ranks, self.size):
+            cost = self.lookup(group)
+            if cost == UNREACHABLE:
+                return UNREACHABLE
+            gain = cost - sum(singles[rank] for rank in group)
+            if gain > 0:
+                gains.append((gain, group))
+        gains.sort(reverse=True)
+        used = set()
+        for gain, group in gains:
+            if used.isdisjoint(group):
+                used.update(group)
+                total += gain
+        return total
+
+    def maximum(self, boxes):
+        ranks = self._ranks(boxes)
+        if ranks is None:
+            return UNREACHABLE
+        if len(ranks) < self.size:
+            return min(sum(self.singles[rank] for rank in ranks), UNREACHABLE)
+        return max(self.lookup(group) for group in itertools.combinations(ranks, self.size))
+
+    def save(self, path):
+        data = bytearray(_HEADER.pack(_MAGIC, self.size, len(self.cells)))
+        data += struct.pack(f"<{len(self.cells)}H", *[self.static.index(cell) for cell in self.cells])
+        data += bytes(min(cost, _UNSOLVABLE) for cost in self.singles)
+        data += self.table
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(descriptor, "wb") as file:
+            file.write(data)
+        os.replace(temporary, path)
+
+    @classmethod
+    def load(cls, static: StaticMap, path):
+        # Returns None when the file is missing or was built for other walls, goals or size
+        try:
+            with open(path, "rb") as file:
+                table = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(table) < _HEADER.size:
+            return None
+        magic, size, cell_count = _HEADER.unpack_from(table)
+        cells_end = _HEADER.size + 2 * cell_count
+        singles_end = cells_end + cell_count
+        if magic != _MAGIC or len(table) != singles_end + comb(cell_count, size):
+            return None
+        cells = [(index % static.width, index // static.width)
+                 for index in struct.unpack_from(f"<{cell_count}H", table, _HEADER.size)]
+        if cells != live_cells(static):
+            return None
+        view = memoryview(table)
+        return cls(static, size, cells, view[cells_end:singles_end], view[singles_end:])
+
+
+def rank_offsets(cell_count, size):
+    # offsets[position][rank] == comb(rank, position + 1): a group's table index is the sum over its
+    # sorted ranks
+    return [[comb(rank, position + 1) for rank in range(cell_count)] for position in range(size)]
+
+
+def live_cells(static: StaticMap):
+    # Cells some goal can be reached from by pushes, in index order
+    nearest = static.nearest_goal_distances()
+    return sorted((cell for cell in static.floor if nearest[static.index(cell)] != UNREACHABLE),
+                  key=static.index)
+
+
+def _pull_costs(static: StaticMap, size, cells, should_stop=None):
+    # Breadth-first pull search from all the goal placements at once: the first time a box placement is
+    # reached is its cost. Returns None once should_stop() is true
+    rank_of = {cell: rank for rank, cell in enumerate(cells)}
+    offsets = rank_offsets(len(cells), size)
+    table = bytearray([_UNSOLVABLE]) * comb(len(cells), size)
+    layer = []
+    seen = set()
+    for state in goal_roots(static, size):
+        key = state.canonical_key()
+        if key not in seen:
+            seen.add(key)
+            layer.append(state)
+    cost = 0
+    pulled = 0
+    while layer:
+        next_layer = []
+        for state in layer:
+            pulled += 1
+            if should_stop is not None and pulled % STOP_CHECK_EVERY == 0 and should_stop():
+                return None
+            ranks = sorted(rank_of[box] for box in state.boxes)
+            index = sum(position_offsets[rank] for position_offsets, rank in zip(offsets, ranks))
+            if table[index] == _UNSOLVABLE:
+                table[index] = min(cost, MAX_COST)
+            for pull in state.get_valid_pulls():
+                child = state.pulled(pull)
+                key = child.canonical_key()
+                if key not in seen:
+                    seen.add(key)
+                    next_layer.append(child)
+        layer = next_layer
+        cost += 1
+    return bytes(table)
+
+
+def build_pattern_database(static: StaticMap, size=PATTERN_SIZE, should_stop=None):
+    # should_stop is called every STOP_CHECK_EVERY placements; the build is abandoned (None) once it is true
+    if should_stop is not None and should_stop():
+        return None
+    cells = live_cells(static)
+    singles = _pull_costs(static, 1, cells, should_stop)
+    table = singles if size == 1 or singles is None else _pull_costs(static, size, cells, should_stop)
+    if table is None:
+        return None
+    return PatternDatabase(static, size, cells, singles, table)
+
+
+def pattern_database_path(directory, static: StaticMap, size):
+    return os.path.join(directory, f"{static_fingerprint(static)}.pdb{size}")
+
+
+def load_pattern_database(static: StaticMap, size=PATTERN_SIZE, directory=None, should_stop=None):
+    # The table stored in directory (a SolutionCache directory), built and stored first when missing.
+    # Without a directory the table is built in memory only. None when should_stop ended the build
+    if directory is None:
+        return build_pattern_database(static, size, should_stop)
+    path = pattern_database_path(directory, static, size)
+    database = PatternDatabase.load(static, path)
+    if database is None:
+        database = build_pattern_database(static, size, should_stop)
+        if database is None:
+            return None
+        os.makedirs(directory, exist_ok=True)
+        database.save(path)
+        database = PatternDatabase.load(static, path)
+    return database
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the pattern databases of the pattern_db heuristics")
+    parser.add_argument("--levels", default="1-55", help="levels to build, e.g. 1-55 or 3,7,10-12")
+    parser.add_argument("--levels-file", default="levels.txt")
+    parser.add_argument("--size", type=int, default=PATTERN_SIZE, help="boxes per pattern")
+    parser.add_argument("--cache", default=os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR),
+                        help="directory the tables are written to")
+    parser.add_argument("--force", action="store_true", help="rebuild tables that already exist")
+    args = parser.parse_args()
+
+    os.makedirs(args.cache, exist_ok=True)
+    for level in parse_levels(args.levels):
+        sokoban = Sokoban(level, args.levels_file)
+        if len(sokoban.get_boxes()) > PATTERN_MAX_BOXES:
+            print(f"Level {level:>3}: more than {PATTERN_MAX_BOXES} boxes, the heuristics use matching")
+            continue
+        static = StaticMap(sokoban)
+        path = pattern_database_path(args.cache, static, args.size)
+        if not args.force and PatternDatabase.load(static, path) is not None:
+            print(f"Level {level:>3}: up to date")
+            continue
+        database = build_pattern_database(static, args.size)
+        database.save(path)
+        print(f"Level {level:>3}: {len(database.cells)} cells, {len(database.table)} entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from state import UNREACHABLE
+
+# Stale entries the sma_star heaps may hold beyond the open nodes before they are rebuilt
+SMA_HEAP_SLACK = 64
+
+
+class SmaMemory:
+    """The nodes sma_star holds: their f values, children in memory and open-list entries.
+
+    Nodes are indexed by state key, so a state is held at most once; dead ends stay
+    until memory runs out so they are not searched again. The open list is a
+    pair of heaps (lowest f first, highest f first) with lazy deletion; both are rebuilt
+    from the open nodes once stale entries outnumber live ones, so forgotten nodes are
+    not kept alive by the heaps.
+    """
+
+    def __init__(self, new_frontier):
+        self.new_frontier = new_frontier
+        self.f_values = {}
+        self.keys = {}
+        self.by_key = {}
+        self.children = {}  # node -> {action: child} of the children in memory
+        self.forgotten = {}  # node -> lowest f of its forgotten children
+        self.open = {}  # Open nodes, in insertion order
+        self.dead = {}  # Expanded nodes without children, held for duplicate detection only
+        self.best = new_frontier()
+        self.worst = new_frontier()
+
+    def __len__(self):
+        return len(self.f_values)
+
+    def add(self, node, key, f):
+        self.f_values[node] = f
+        self.keys[node] = key
+        self.by_key[key] = node
+        if node.parent is not None:
+            self.children[node.parent][node.action] = node
+        self.open_node(node)
+
+    def open_node(self, node):
+        self.open[node] = None
+        self._push(node)
+        if max(len(self.best), len(self.worst)) > 2 * len(self.open) + SMA_HEAP_SLACK:
+            self.best = self.new_frontier()
+            self.worst = self.new_frontier()
+            for open_node in self.open:
+                self._push(open_node)
+
+    def _push(self, node):
+        f = self.f_values[node]
+        self.best.push(node, f, -node.depth)
+        self.worst.push(node, -f, node.depth)
+
+    def pop_best(self):
+        # The open node with the lowest f, deepest first on ties, or None once there is none
+        while self.best:
+            f = self.best.peek_priority()
+            node = self.best.pop()
+            if node in self.open and self.f_values[node] == f:
+                del self.open[node]
+                return node
+        return None
+
+    def close(self, node):
+        self.f_values[node] = UNREACHABLE
+        self.dead[node] = None
+
+    def pop_worst(self, root):
+        # The oldest dead end, else the open leaf other than root with the highest f, shallowest first on
+        # ties, or None. A node with children in memory is pushed again once they are gone
+        if self.dead:
+            node = next(iter(self.dead))
+            del self.dead[node]
+            return node
+        while self.worst:
+            f = -self.worst.peek_priority()
+            node = self.worst.pop()
+            if node in self.open and self.f_values[node] == f and node is not root and not self.children.get(node):
+                del self.open[node]
+                return node
+        return None
+
+    def _remove(self, node):
+        del self.f_values[node]
+        key = self.keys.pop(node)
+        if self.by_key[key] is node:
+            del self.by_key[key]
+        self.children.pop(node, None)
+        self.forgotten.pop(node, None)
+        self.open.pop(node, None)
+        self.dead.pop(node, None)
+
+    def forget(self, node, f=None):
+        # Drops a leaf and backs its f (or the given one, UNREACHABLE for a dead end) up to its parent,
+        # which is opened again to regenerate it; a parent left with nothing worth regenerating goes as well
+        while True:
+            backed = self.f_values[node] if f is None else f
+            self._remove(node)
+            parent = node.parent
+            del self.children[parent][node.action]
+            forgotten = min(self.forgotten.get(parent, UNREACHABLE), backed)
+            if forgotten < UNREACHABLE:
+                self.forgotten[parent] = self.f_values[parent] = forgotten
+                self.open_node(parent)
+                return
+            if self.children[parent] or parent.parent is None:
+                return
+            node, f = parent, UNREACHABLE
+
+    def replace(self, node):
+        # Drops a node reached again by a cheaper path, with its whole subtree
+        stack = list(self.children.get(node, {}).values())
+        while stack:
+            descendant = stack.pop()
+            stack.extend(self.children.get(descendant, {}).values())
+            self._remove(descendant)
+        self.forget(node, UNREACHABLE)
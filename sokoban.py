@@ -3,6 +3,9 @@ from typing import Tuple
 from enum import Enum
 import copy
 
+from bitboard import BitboardLevel
+from level_library import LevelLibrary, ParsedLevel
+
 class Sokoban:
     class Icons(Enum):
         WALL = '#'
@@ -20,76 +23,64 @@ class Sokoban:
         DOWN = (0, 1)
         NONE = (0, 0)
 
-    def _is_valid_value(self, value):
-        return value in [item.value for item in self.Icons]
+    _DIRECTIONS_BY_OFFSET = {item.value: item for item in Direction}
 
     def get_valid_directions(self):
-        valid_moves = []
-        for direction in Sokoban.Direction:
-            if (self._can_move(direction) or self._can_push(direction)) and direction != self.Direction.NONE:
-                valid_moves.append(direction)
-        return valid_moves
+        return [self._DIRECTIONS_BY_OFFSET[offset]
+                for offset in self._board.valid_moves(self._player_bit, self._box_bits)]
     
     def _init_player(self) -> Tuple[int, int, Icons]:
-        for y, row in enumerate(self.level_state):
-            for x, cell in enumerate(row):
-                if cell == self.Icons.PLAYER or cell == self.Icons.PLAYER_ON_GOAL:
-                    return (x, y, cell)
-        raise RuntimeError("Player not found")
+        if not self._player_bit:
+            raise RuntimeError("Player not found")
+        x, y = self._board.first_point(self._player_bit)
+        return (x, y, self.get_cell_content(x, y))
 
     def __init__(self, level: int, levels_file: str):
-        self.level_state = []
-        self.boxes = set()
-        self.goals = set()
-        self.player=(0,0,None)
-        x=0
-        y=0
-
         if level < 1:
             print("ERROR: Level " + str(level) + " does not exist")
             sys.exit(1)
 
-        file = open(levels_file, "r")
-        level_found = False
-        line = file.readline()
-        while line:
-            if not level_found:
-                if "Level " + str(level) == line.strip():
-                    level_found = True
-            else:
-                if line.strip():
-                    row = []
-                    x = 0
-                    for c in line:
-                        # If end of line
-                        if c == "\n":
-                            y += 1
-                            x = 0
-                            continue
-                        # If invalid character
-                        if not self._is_valid_value(c): raise RuntimeError(f"ERROR: Level {level} has invalid value {c}")
-
-                        row.append(self.Icons(c))
-                        point = (x, y)
-                        if c == '$':    # If is a box
-                            self.boxes.add(point)
-                        elif c == '.':    # If is a goal
-                            self.goals.add(point)
-                        elif c == '*':    # If is a box on a goal
-                            self.boxes.add(point)
-                            self.goals.add(point)
-                        elif c == '+':    # If is a player on a goal
-                            self.goals.add(point)
-                        x += 1
-                    self.level_state.append(row)
-                else:
-                    break
-            line = file.readline()
-        file.close()
+        # The file is indexed once per process; the level itself is parsed on first use
+        self._load(LevelLibrary.shared(levels_file).get(level))
+
+    @classmethod
+    def from_parsed(cls, parsed: ParsedLevel) -> "Sokoban":
+        sokoban = cls.__new__(cls)
+        sokoban._load(parsed)
+        return sokoban
+
+    def _load(self, parsed: ParsedLevel):
+        # The game is a thin layer over the level's bitboards, the same engine the solver states use
+        self._rows = parsed.rows
+        self._board = parsed.board()
+        self._box_bits = self._board.bits_of(parsed.boxes)
+        self._player_bit = self._board.bit(parsed.player) if parsed.player is not None else 0
+        self._level_state = None
+        self.boxes = set(parsed.boxes)
+        self.goals = set(parsed.goals)
         self.player = self._init_player()
 
+    def __deepcopy__(self, memo):
+        # The rows and the static bitboards never change, so copies share them
+        clone = copy.copy(self)
+        clone.boxes = set(self.boxes)
+        clone.goals = set(self.goals)
+        clone._level_state = None
+        return clone
+
+    @property
+    def level_state(self):
+        # The icon grid is rendered from the bitboards when asked for
+        if self._level_state is None:
+            self._level_state = [[self.get_cell_content(x, y) for x in range(len(row))]
+                                 for y, row in enumerate(self._rows)]
+        return self._level_state
+
     def get_level_state(self):
         return self.level_state
+
+    def get_board(self):
+        return self._board
     
     def get_player(self):
         return self.player
@@ -102,103 +93,115 @@ class Sokoban:
 
     def _set_player(self, player):
         self.player = player
+        self._player_bit = self._board.bit(player[:2])
+        self._level_state = None
         
     def set_boxes(self, boxes):
         self.boxes = copy.deepcopy(boxes)
-        
+        self._box_bits = self._board.bits_of(self.boxes)
+        self._level_state = None
+
     def _set_goals(self, goals):
         self.goals = copy.deepcopy(goals)
+        self._set_board(self._board.points_of(self._board.floor), self.goals)
+
+    def _set_board(self, floor, goals):
+        # The level's board is shared by all its games, so a game whose walls or goals change gets its own
+        self._board = BitboardLevel(self._board.width, self._board.height, floor, goals)
+        self._level_state = None
 
     def print_level_state(self):
         for row in self.level_state:
             row_str = "".join([char.value for char in row])
             print(row_str, end="\n")
 
+    def _in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= y < len(self._rows) and 0 <= x < len(self._rows[y])
+
     def get_cell_content(self, x: int, y: int) -> Icons:
-        if (x < 0 or y < 0 or y >= len(self.level_state) or x >= len(self.level_state[y])):
+        if not self._in_bounds(x, y):
+            return self.Icons.WALL
+        bit = self._board.bit((x, y))
+        if not bit & self._board.floor:
             return self.Icons.WALL
-        return self.level_state[y][x]
+        on_goal = bit & self._board.goals
+        if bit & self._box_bits:
+            return self.Icons.BOX_ON_GOAL if on_goal else self.Icons.BOX
+        if bit == self._player_bit:
+            return self.Icons.PLAYER_ON_GOAL if on_goal else self.Icons.PLAYER
+        return self.Icons.GOAL if on_goal else self.Icons.FLOOR
 
     def _set_cell_content(self, x: int, y: int, content: Icons):
-        if (x < 0 or y < 0 or y >= len(self.level_state) or x >= len(self.level_state[y])):
+        if not self._in_bounds(x, y):
             raise RuntimeError("Cell is out of bounds")
-        self.level_state[y][x] = content
+        point = (x, y)
+        bit = self._board.bit(point)
+        floor = content != self.Icons.WALL
+        goal = content in [self.Icons.GOAL, self.Icons.BOX_ON_GOAL, self.Icons.PLAYER_ON_GOAL]
+        if floor != bool(bit & self._board.floor) or goal != bool(bit & self._board.goals):
+            floor_points = set(self._board.points_of(self._board.floor))
+            floor_points.discard(point)
+            self.goals.discard(point)
+            if floor:
+                floor_points.add(point)
+            if goal:
+                self.goals.add(point)
+            self._set_board(floor_points, self.goals)
+            bit = self._board.bit(point)
+        if content in [self.Icons.BOX, self.Icons.BOX_ON_GOAL]:
+            self.boxes.add(point)
+            self._box_bits |= bit
+        else:
+            self.boxes.discard(point)
+            self._box_bits &= ~bit
+        if content in [self.Icons.PLAYER, self.Icons.PLAYER_ON_GOAL]:
+            self.player = (x, y, content)
+            self._player_bit = bit
+        elif self._player_bit == bit:
+            self._player_bit = 0
+        self._level_state = None
 
     def level_complete(self) -> bool:
-        for row in self.level_state:
-            for cell in row:
-                if cell == self.Icons.BOX:
-                    return False
-        return True
+        return self._board.is_solved(self._box_bits)
 
     # private
     def _move_box(self, x: int, y: int, x_diff: int, y_diff: int):
-        box_cell = self.get_cell_content(x, y)
+        box_bit = self._board.bit((x, y))
+        target_bit = self._board.bit((x + x_diff, y + y_diff))
 
-        if box_cell not in [self.Icons.BOX, self.Icons.BOX_ON_GOAL]:
+        if not box_bit & self._box_bits:
             raise RuntimeError("Cell is not a box")
 
-        target_cell = self.get_cell_content(x + x_diff, y + y_diff)
-
-        if target_cell not in [self.Icons.FLOOR, self.Icons.GOAL]:
+        if not target_bit & self._board.floor & ~self._box_bits or target_bit == self._player_bit:
             raise RuntimeError("Cell is not a valid box target")
 
-        new_box_cell = (self.Icons.FLOOR if box_cell == self.Icons.BOX else self.Icons.GOAL)
-        new_target_cell = (self.Icons.BOX if target_cell == self.Icons.FLOOR else self.Icons.BOX_ON_GOAL)
-
         point = (x, y)
         new_point = (x + x_diff, y + y_diff)
         self.boxes.remove(point)
         self.boxes.add(new_point)
-        self._set_cell_content(x, y, new_box_cell)
-        self._set_cell_content(x + x_diff, y + y_diff, new_target_cell)
+        self._box_bits ^= box_bit | target_bit
+        self._level_state = None
 
     def _can_move(self, direction: Direction) -> bool:
-        player_x, player_y, _ = self.get_player()
-        x_diff, y_diff = direction.value
-
-        target_cell = self.get_cell_content(player_x + x_diff, player_y + y_diff)
-
-        return target_cell not in [self.Icons.WALL, self.Icons.BOX, self.Icons.BOX_ON_GOAL]
+        return self._board.can_step(self._player_bit, self._box_bits, direction.value)
 
     def _next(self, x: int, y: int) -> Icons:
         player_x, player_y, _ = self.get_player()
         return self.get_cell_content(player_x + x, player_y + y)
 
     def _can_push(self, dir: Direction) -> bool:
-        (x, y) = dir.value
-
-        player_is_adjacent_to_box = self._next(x, y) in [self.Icons.BOX, self.Icons.BOX_ON_GOAL]
-        box_can_be_pushed = self._next(2 * x, 2 * y) in [self.Icons.FLOOR, self.Icons.GOAL]
-
-        return player_is_adjacent_to_box and box_can_be_pushed
+        return self._board.can_push(self._player_bit, self._box_bits, dir.value)
 
     def move_player(self, dir: Direction):
         (x, y) = dir.value
-        if self._can_move(dir):
-            player_x, player_y, player_cell = self.get_player()
-            target_cell = self._next(x, y)
-
-            new_player_cell = (self.Icons.FLOOR if player_cell == self.Icons.PLAYER else self.Icons.GOAL)
-
-            new_target_cell = (self.Icons.PLAYER if target_cell == self.Icons.FLOOR else self.Icons.PLAYER_ON_GOAL)
-            
-            self._set_player((player_x + x, player_y + y, new_target_cell))
-            self._set_cell_content(player_x, player_y, new_player_cell)
-            self._set_cell_content(player_x + x, player_y + y, new_target_cell)
-
-        elif self._can_push(dir):
-            player_x, player_y, player_cell = self.get_player()
-            target_cell = self._next(x, y)
-
-            new_player_cell = (self.Icons.FLOOR if player_cell == self.Icons.PLAYER else self.Icons.GOAL)
-
-            new_target_cell = (self.Icons.PLAYER if target_cell == self.Icons.BOX else self.Icons.PLAYER_ON_GOAL)
-
-            self._move_box(player_x + x, player_y + y, x, y)
-            self._set_player((player_x + x, player_y + y, new_target_cell))
-            self._set_cell_content(player_x, player_y, new_player_cell)
-            self._set_cell_content(player_x + x, player_y + y, new_target_cell)
+        can_move = self._can_move(dir)
+        if can_move or self._can_push(dir):
+            player_x, player_y, _ = self.get_player()
+            if not can_move:
+                self._move_box(player_x + x, player_y + y, x, y)
+            on_goal = self._board.bit((player_x + x, player_y + y)) & self._board.goals
+            self._set_player((player_x + x, player_y + y,
+                              self.Icons.PLAYER_ON_GOAL if on_goal else self.Icons.PLAYER))
 
 # def game():
 #     level = 52
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import tempfile
+
+from lurd import LURD_LETTERS
+from verifier import SolutionVerifier
+
+# Directory used by SolutionCache() when none is given
+CACHE_DIR_ENV = "SOKOBAN_CACHE_DIR"
+DEFAULT_CACHE_DIR = ".sokoban_cache"
+
+# Searches that return a cheapest solution in their mode's cost (moves or pushes) when the heuristic,
+# if any, is admissible. manhattan_player is at least 1 on a solved level, so it is not
+OPTIMAL_ALGORITHMS = ["bfs", "iddfs", "a_star", "anytime_a_star", "hda_star", "ida_star", "sma_star"]
+ADMISSIBLE_HEURISTICS = [None, "manhattan_boxes", "grid", "matching", "pattern_db", "pattern_db_max"]
+# Stored with the per-level tables; tables written by an older version are built again
+TABLES_VERSION = 2
+
+
+def level_fingerprint(sokoban) -> str:
+    # Walls, goals and the starting boxes and player, as drawn
+    rows = ["".join(icon.value for icon in row) for row in sokoban.get_level_state()]
+    return hashlib.sha256("\n".join(rows).encode()).hexdigest()[:32]
+
+
+def static_fingerprint(static) -> str:
+    # Walls and goals only: what the per-level tables depend on
+    text = f"{static.width}x{static.height}|{sorted(static.floor)}|{static.goal_list}"
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def solution_key(algorithm_name, heuristic_name, mode, dedup, deadlocks, weights=None, decompose=False,
+                 max_depth=None) -> str:
+    # The settings that change which solution is found and how many nodes it takes; weights is the
+    # schedule of anytime_a_star and max_depth the depth limit of iddfs
+    parts = [algorithm_name, heuristic_name or "", mode, "dedup" if dedup else "no_dedup", ",".join(sorted(deadlocks))]
+    if weights is not None:
+        parts.append(",".join(f"{weight:g}" for weight in weights))
+    if max_depth is not None:
+        parts.append(f"depth={max_depth}")
+    if decompose:
+        parts.append("decompose")
+    return "|".join(parts)
+
+
+def is_optimal(algorithm_name, heuristic_name) -> bool:
+    return algorithm_name in OPTIMAL_ALGORITHMS and heuristic_name in ADMISSIBLE_HEURISTICS
+
+
+def replay(sokoban, moves) -> bool:
+    return SolutionVerifier.from_sokoban(sokoban).verify("".join(LURD_LETTERS[move] for move in moves)).solved
+
+
+class SolutionCache:
+    """Solutions and per-level tables kept on disk between runs.
+
+    Solutions live in a <level fingerprint>.solutions directory, one file per
+    solution_key() with the LURD moves, the search statistics and an `optimal` flag per
+    cost ("moves", "pushes"). Tables (distance maps, dead squares, ...) live in
+    <static fingerprint>.tables.json. Every file holds one entry written by one search
+    and is replaced atomically, so parallel benchmark workers can share a directory
+    without losing each other's results. A cached solution is only returned after
+    replaying it on the level; one that fails is dropped.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = directory or os.environ.get(CACHE_DIR_ENV, DEFAULT_CACHE_DIR)
+        os.makedirs(self.directory, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def _path(self, fingerprint, kind):
+        return os.path.join(self.directory, f"{fingerprint}.{kind}.json")
+
+    def _solutions_directory(self, sokoban):
+        return os.path.join(self.directory, f"{level_fingerprint(sokoban)}.solutions")
+
+    def _solution_path(self, sokoban, key):
+        name = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return os.path.join(self._solutions_directory(sokoban), f"{name}.json")
+
+    def _load(self, path):
+        try:
+            with open(path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, path, data):
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(data, file)
+        os.replace(temporary, path)
+
+    def get_solution(self, sokoban, key):
+        path = self._solution_path(sokoban, key)
+        entry = self._load(path)
+        # A hash collision would leave another key's entry in the file
+        if entry.get("key") != key:
+            self.misses += 1
+            return None
+        lurd = entry.get("lurd")
+        if not isinstance(lurd, str) or not SolutionVerifier.from_sokoban(sokoban).verify(lurd).solved:
+            self.rejected += 1
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        self.hits += 1
+        return entry
+
+    def put_solution(self, sokoban, key, entry):
+        os.makedirs(self._solutions_directory(sokoban), exist_ok=True)
+        self._save(self._solution_path(sokoban, key), dict(entry, key=key))
+
+    def tables(self, static, build):
+        # Loads the tables of a static map, or builds them with build() and stores them
+        path = self._path(static_fingerprint(static), "tables")
+        tables = self._load(path)
+        if tables.get("version") != TABLES_VERSION:
+            tables = dict(build(), version=TABLES_VERSION)
+            self._save(path, tables)
+        return tables
@@ -0,0 +1,258 @@
+import itertools
+import sys
+from typing import FrozenSet, List, Tuple
+
+from sokoban import Sokoban
+
+Point = Tuple[int, int]
+
+# Directions a player can actually take, in the same order as Sokoban.get_valid_directions
+MOVES = [direction for direction in Sokoban.Direction if direction != Sokoban.Direction.NONE]
+OFFSETS = [direction.value for direction in MOVES]
+MOVES_BY_OFFSET = {direction.value: direction for direction in MOVES}
+MOVE_ORDER = {direction: order for order, direction in enumerate(MOVES)}
+
+# Distance table value for cells a box can never be pushed from, and the heuristic value of a dead state:
+# such states sort last and are never part of a solution (anytime A*, IDA* and HDA* drop them)
+UNREACHABLE = sys.maxsize
+
+
+class StaticMap:
+    """The part of a level that never changes during a search: walls and goals."""
+
+    def __init__(self, sokoban: Sokoban):
+        self.board = sokoban.get_board()
+        self.floor: FrozenSet[Point] = frozenset(self.board.points_of(self.board.floor))
+        self.goals: FrozenSet[Point] = frozenset(sokoban.get_goals())
+        self.height = self.board.height
+        self.width = self.board.width
+        self.goal_list: List[Point] = sorted(self.goals)
+        self._goal_distances = None
+        self._nearest_goal_distances = None
+        # Cells no box can be pushed to a goal from, set by the first DeadlockDetector (or a cache)
+        self.dead_squares = None
+
+    def is_wall(self, x: int, y: int) -> bool:
+        return (x, y) not in self.floor
+
+    def index(self, point: Point) -> int:
+        return point[1] * self.width + point[0]
+
+    def _push_distances(self, goal: Point) -> List[int]:
+        # BFS of box pulls away from the goal: pushes needed to bring a box from each cell to it,
+        # ignoring other boxes and whether the player can get behind the box
+        distances = [UNREACHABLE] * (self.width * self.height)
+        distances[self.index(goal)] = 0
+        queue = [goal]
+        for x, y in queue:
+            distance = distances[self.index((x, y))] + 1
+            for x_diff, y_diff in OFFSETS:
+                box_target = (x + x_diff, y + y_diff)
+                if (box_target in self.floor and (x + 2 * x_diff, y + 2 * y_diff) in self.floor and
+                        distances[self.index(box_target)] == UNREACHABLE):
+                    distances[self.index(box_target)] = distance
+                    queue.append(box_target)
+        return distances
+
+    def goal_distances(self) -> List[List[int]]:
+        # One flat table per goal (in goal_list order), indexed with index()
+        if self._goal_distances is None:
+            self._goal_distances = [self._push_distances(goal) for goal in self.goal_list]
+        return self._goal_distances
+
+    def load_goal_distances(self, tables: List[List[int]]):
+        # Tables computed earlier for the same walls and goals, see solution_cache
+        self._goal_distances = tables
+        self._nearest_goal_distances = None
+
+    def nearest_goal_distances(self) -> List[int]:
+        if self._nearest_goal_distances is None:
+            self._nearest_goal_distances = [min(column, default=UNREACHABLE)
+                                            for column in zip(*self.goal_distances())]
+        return self._nearest_goal_distances
+
+
+class SearchState:
+    """Immutable search node payload: the player cell and a frozen set of box cells.
+
+    Exposes the read-only part of the Sokoban API (get_player, get_boxes, get_goals,
+    get_cell_content, get_valid_directions, level_complete) so the solver heuristics
+    work on it unchanged, but moving returns a new state instead of mutating a grid.
+    """
+    Icons = Sokoban.Icons
+    Direction = Sokoban.Direction
+
+    __slots__ = ("static", "player", "boxes", "_box_bits")
+
+    def __init__(self, static: StaticMap, player: Point, boxes: FrozenSet[Point], box_bits: int = None):
+        self.static = static
+        self.player = player
+        self.boxes = boxes
+        self._box_bits = box_bits
+
+    @classmethod
+    def from_sokoban(cls, sokoban: Sokoban, static: StaticMap = None):
+        if static is None:
+            static = StaticMap(sokoban)
+        x, y, _ = sokoban.get_player()
+        return cls(static, (x, y), frozenset(sokoban.get_boxes()))
+
+    def __eq__(self, other):
+        return self.player == other.player and self.boxes == other.boxes
+
+    def __hash__(self):
+        return hash((self.player, self.boxes))
+
+    @property
+    def box_bits(self) -> int:
+        # The boxes as a bitboard of static.board, built on first use and handed down to children
+        if self._box_bits is None:
+            self._box_bits = self.static.board.bits_of(self.boxes)
+        return self._box_bits
+
+    def _child_bits(self, box: Point, target: Point):
+        if self._box_bits is None:
+            return None
+        board = self.static.board
+        return self._box_bits ^ board.bit(box) ^ board.bit(target)
+
+    def key(self):
+        return (self.player, self.boxes)
+
+    def canonical_key(self):
+        # Player positions that can walk to each other without pushing are the same push-level state,
+        # so the region is normalized to its top-left-most cell
+        return (self.static.board.first_point(self.reachable_bits()), self.boxes)
+
+    def reachable_bits(self) -> int:
+        board = self.static.board
+        return board.reachable(board.bit(self.player), self.box_bits)
+
+    def reachable(self):
+        return set(self.static.board.points_of(self.reachable_bits()))
+
+    def path_to(self, target: Point):
+        # Shortest walk (no pushes) from the player to target, as a list of directions
+        if target == self.player:
+            return []
+        floor = self.static.floor
+        boxes = self.boxes
+        parents = {self.player: None}
+        queue = [self.player]
+        for point in queue:
+            x, y = point
+            for direction in MOVES:
+                x_diff, y_diff = direction.value
+                neighbour = (x + x_diff, y + y_diff)
+                if neighbour in floor and neighbour not in boxes and neighbour not in parents:
+                    parents[neighbour] = (point, direction)
+                    if neighbour == target:
+                        path = []
+                        while parents[neighbour] is not None:
+                            neighbour, direction = parents[neighbour]
+                            path.append(direction)
+                        path.reverse()
+                        return path
+                    queue.append(neighbour)
+        return None
+
+    def get_player(self):
+        icon = self.Icons.PLAYER_ON_GOAL if self.player in self.static.goals else self.Icons.PLAYER
+        return (self.player[0], self.player[1], icon)
+
+    def get_boxes(self):
+        return self.boxes
+
+    def get_goals(self):
+        return self.static.goals
+
+    def get_cell_content(self, x: int, y: int):
+        point = (x, y)
+        if point not in self.static.floor:
+            return self.Icons.WALL
+        on_goal = point in self.static.goals
+        if point in self.boxes:
+            return self.Icons.BOX_ON_GOAL if on_goal else self.Icons.BOX
+        if point == self.player:
+            return self.Icons.PLAYER_ON_GOAL if on_goal else self.Icons.PLAYER
+        return self.Icons.GOAL if on_goal else self.Icons.FLOOR
+
+    def level_complete(self) -> bool:
+        if self._box_bits is not None:
+            return self.static.board.is_solved(self._box_bits)
+        return self.boxes <= self.static.goals
+
+    def get_valid_directions(self):
+        board = self.static.board
+        return [MOVES_BY_OFFSET[offset] for offset in board.valid_moves(board.bit(self.player), self.box_bits)]
+
+    def _box_actions(self, masks):
+        # (box, direction) pairs from one bitboard of movable boxes per direction, sorted by box
+        board = self.static.board
+        actions = []
+        for direction, mask in zip(MOVES, masks):
+            for box in board.points_of(mask):
+                actions.append((box, direction))
+        actions.sort(key=lambda action: (action[0], MOVE_ORDER[action[1]]))
+        return actions
+
+    def get_valid_pushes(self):
+        # One (box, direction) action per box push the player can walk to and perform
+        board = self.static.board
+        reachable = self.reachable_bits()
+        boxes = self.box_bits
+        return self._box_actions([board.pushable(reachable, boxes, offset) for offset in OFFSETS])
+
+    def pushed(self, push) -> "SearchState":
+        # Assumes push comes from get_valid_pushes; the player ends where the box was
+        box, direction = push
+        x_diff, y_diff = direction.value
+        target = (box[0] + x_diff, box[1] + y_diff)
+        return SearchState(self.static, box, self.boxes.difference((box,)).union((target,)),
+                           self._child_bits(box, target))
+
+    def get_valid_pulls(self):
+        # Reverse of a push, for searching backwards from the goals: the player stands next to a box,
+        # steps away from it and drags it along
+        board = self.static.board
+        reachable = self.reachable_bits()
+        boxes = self.box_bits
+        return self._box_actions([board.pullable(reachable, boxes, offset) for offset in OFFSETS])
+
+    def pulled(self, pull) -> "SearchState":
+        # Assumes pull comes from get_valid_pulls
+        box, direction = pull
+        x_diff, y_diff = direction.value
+        target = (box[0] + x_diff, box[1] + y_diff)
+        player = (box[0] + 2 * x_diff, box[1] + 2 * y_diff)
+        return SearchState(self.static, player, self.boxes.difference((box,)).union((target,)),
+                           self._child_bits(box, target))
+
+    def moved(self, direction) -> "SearchState":
+        # Assumes direction comes from get_valid_directions
+        x_diff, y_diff = direction.value
+        x, y = self.player
+        target = (x + x_diff, y + y_diff)
+        boxes = self.boxes
+        if target in boxes:
+            beyond = (x + 2 * x_diff, y + 2 * y_diff)
+            return SearchState(self.static, target, boxes.difference((target,)).union((beyond,)),
+                               self._child_bits(target, beyond))
+        return SearchState(self.static, target, boxes, self._box_bits)
+
+
+def goal_roots(static: StaticMap, box_count: int):
+    # Every way to put box_count boxes on goals, with the player in each region touching a box: the
+    # starting states of the searches that pull boxes back from the goals
+    floor_cells = sorted(static.floor, key=static.index)
+    for goals in itertools.combinations(static.goal_list, box_count):
+        boxes = frozenset(goals)
+        seen = set()
+        for cell in floor_cells:
+            if cell in boxes or cell in seen:
+                continue
+            state = SearchState(static, cell, boxes)
+            region = state.reachable()
+            seen |= region
+            if any((x + x_diff, y + y_diff) in boxes for x, y in region for x_diff, y_diff in OFFSETS):
+                yield state
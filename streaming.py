@@ -0,0 +1,118 @@
+import asyncio
+import queue
+import threading
+import time
+
+from algorithms import Cancellation
+
+
+class SolverEvent:
+    """One item of a solve stream.
+
+    kind is "progress" (sample is the latest (elapsed seconds, expanded nodes, frontier
+    size, nodes/sec) tuple of the SearchMetrics), "solution" (result is a better
+    solution found by anytime_a_star, with its bound) or "done" (result is the final
+    SearchResult; a search stopped by its deadline or a cancel keeps the best solution
+    it had found).
+    """
+
+    def __init__(self, kind, elapsed, sample=None, result=None):
+        self.kind = kind
+        self.elapsed = elapsed
+        self.sample = sample
+        self.result = result
+
+    def __repr__(self):
+        return f"SolverEvent({self.kind}, {self.elapsed:.3f}s)"
+
+
+def _run_search(solver, emit, algorithm_name, heuristic_name, cancel, progress_interval, options):
+    # Runs solve() on the calling thread, turning its callbacks into events passed to emit.
+    # An exception ends the stream and is raised again on the consumer's side.
+    start = time.perf_counter()
+
+    def progress(metrics):
+        emit(SolverEvent("progress", time.perf_counter() - start, sample=metrics.samples[-1]))
+
+    def on_solution(result):
+        emit(SolverEvent("solution", time.perf_counter() - start, result=result))
+
+    try:
+        result = solver.solve(algorithm_name, heuristic_name, cancel=cancel, progress=progress,
+                              on_solution=on_solution, progress_interval=progress_interval, **options)
+    except BaseException as error:
+        emit(error)
+        return
+    emit(SolverEvent("done", time.perf_counter() - start, result=result))
+
+
+def solve_stream(solver, algorithm_name, heuristic_name=None, time_limit=None, cancel=None, progress_interval=1.0,
+                 **options):
+    """Generator over the events of one solver.solve() run, ending with the "done" event.
+
+    The search runs on a worker thread. It is cancelled cooperatively when time_limit
+    seconds have passed (status "time_limit"), when cancel.cancel() is called, or when
+    the generator is closed before the end. Other keyword arguments go to solve().
+    """
+    cancel = cancel or Cancellation()
+    deadline = time.perf_counter() + time_limit if time_limit is not None else None
+    events = queue.Queue()
+    thread = threading.Thread(target=_run_search, args=(solver, events.put, algorithm_name, heuristic_name, cancel,
+                                                        progress_interval, options), daemon=True)
+    thread.start()
+    try:
+        while True:
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - time.perf_counter())
+                event = events.get(timeout=timeout)
+            except queue.Empty:
+                cancel.cancel("time_limit")
+                deadline = None
+                continue
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+            if event.kind == "done":
+                return
+    finally:
+        if thread.is_alive():
+            cancel.cancel()
+            thread.join()
+
+
+async def solve_async(solver, algorithm_name, heuristic_name=None, time_limit=None, cancel=None,
+                      progress_interval=1.0, **options):
+    """Async generator version of solve_stream(); the search runs in the event loop's default executor."""
+    cancel = cancel or Cancellation()
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + time_limit if time_limit is not None else None
+    events = asyncio.Queue()
+    task = loop.run_in_executor(None, _run_search, solver,
+                                lambda event: loop.call_soon_threadsafe(events.put_nowait, event),
+                                algorithm_name, heuristic_name, cancel, progress_interval, options)
+    try:
+        while True:
+            try:
+                timeout = None if deadline is None else max(0.0, deadline - loop.time())
+                event = await asyncio.wait_for(events.get(), timeout)
+            except asyncio.TimeoutError:
+                cancel.cancel("time_limit")
+                deadline = None
+                continue
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+            if event.kind == "done":
+                return
+    finally:
+        if not task.done():
+            cancel.cancel()
+        await task
+
+
+def solve_within(solver, time_budget, heuristic_name="matching", mode="pushes", **options):
+    # Best solution anytime_a_star finds in time_budget seconds (result.limit tells whether it was cut short)
+    for event in solve_stream(solver, "anytime_a_star", heuristic_name, time_limit=time_budget, mode=mode,
+                              **options):
+        if event.kind == "done":
+            return event.result
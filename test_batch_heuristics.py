@@ -0,0 +1,55 @@
+import unittest
+
+from algorithms import SokobanSolver
+from batch_heuristics import CellTableBatch, cell_table, np
+from sokoban import Sokoban
+from state import UNREACHABLE
+
+
+@unittest.skipIf(np is None, "NumPy is not installed")
+class BatchHeuristicsTest(unittest.TestCase):
+    def _states(self, solver, mode):
+        # The start, its children and grandchildren: a few whole expansions of the mode
+        solver.mode = mode
+        nodes = [solver.initial_node]
+        for _ in range(2):
+            nodes += [child for node in list(nodes) for child in solver._expand(node)]
+        return [node.state for node in nodes]
+
+    def test_batch_matches_scalar_heuristics(self):
+        for level in [1, 20, 43]:
+            solver = SokobanSolver(Sokoban(level, "levels.txt"))
+            for mode in ["moves", "pushes"]:
+                states = self._states(solver, mode)
+                for heuristic_fn, batch in solver._get_batch_heuristics().items():
+                    with self.subTest(level=level, mode=mode, heuristic=heuristic_fn.__name__):
+                        self.assertEqual(batch.evaluate(states), [heuristic_fn(state) for state in states])
+
+    def test_unreachable_cells_add_up_exactly(self):
+        solver = SokobanSolver(Sokoban(20, "levels.txt"))
+        static = solver.static_map
+        table = cell_table(static, lambda point: solver.grid[point[1]][point[0]])
+        states = self._states(solver, "moves")
+        expected = [sum(table[static.index(box)] for box in state.boxes) for state in states]
+        self.assertEqual(CellTableBatch(static, table).evaluate(states), expected)
+        table[static.index(next(iter(states[0].boxes)))] = UNREACHABLE
+        self.assertGreaterEqual(CellTableBatch(static, table).evaluate(states[:1])[0], UNREACHABLE)
+
+    def test_searches_expand_the_same_nodes_batched(self):
+        # Level 43 has 80 boxes, so its expansions with 4 children are batched for manhattan_player;
+        # manhattan_boxes is batched from 2 children of level 20 when it is not updated incrementally
+        for level, heuristic_name in [(43, "manhattan_player"), (20, "manhattan_boxes")]:
+            sokoban = Sokoban(level, "levels.txt")
+            runs = []
+            for batch in [True, False]:
+                solver = SokobanSolver(sokoban)
+                solver.batch = batch
+                solver.incremental = False
+                result = solver.solve("a_star", heuristic_name, max_nodes=2000)
+                runs.append((result.status, result.nodes, result.generated, result.metrics.peak_frontier))
+            with self.subTest(level=level, heuristic=heuristic_name):
+                self.assertEqual(runs[0], runs[1])
+
+
+if __name__ == "__main__":
+    unittest.main()
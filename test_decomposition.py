@@ -0,0 +1,61 @@
+import random
+import unittest
+
+from algorithms import SokobanSolver
+from decomposition import articulation_points
+from lurd import to_lurd
+from sokoban import Sokoban
+from state import OFFSETS
+from verifier import SolutionVerifier
+
+
+def connected(cells, start):
+    seen = {start}
+    queue = [start]
+    for x, y in queue:
+        for x_diff, y_diff in OFFSETS:
+            neighbour = (x + x_diff, y + y_diff)
+            if neighbour in cells and neighbour not in seen:
+                seen.add(neighbour)
+                queue.append(neighbour)
+    return seen
+
+
+def brute_force_articulation_points(cells, start):
+    # Removing the cell leaves the rest of start's region in more than one piece
+    region = connected(cells, start)
+    points = set()
+    for cell in region:
+        rest = region - {cell}
+        if rest and len(connected(rest, next(iter(rest)))) < len(rest):
+            points.add(cell)
+    return points
+
+
+class DecompositionTest(unittest.TestCase):
+    def test_articulation_points_match_brute_force(self):
+        generator = random.Random(7)
+        for grid in range(50):
+            cells = {(x, y) for x in range(6) for y in range(5) if generator.random() < 0.65}
+            if not cells:
+                continue
+            start = min(cells)
+            with self.subTest(grid=grid):
+                self.assertEqual(articulation_points(cells, start), brute_force_articulation_points(cells, start))
+
+    def test_decomposed_solution_replays(self):
+        sokoban = Sokoban(9, "levels.txt")
+        for workers in [1, 2]:
+            solver = SokobanSolver(sokoban)
+            result = solver.solve("a_star", "matching", mode="pushes", workers=workers, decompose=True)
+            with self.subTest(workers=workers):
+                self.assertTrue(result.stitched)
+                self.assertEqual(result.subproblems, 2)
+                verification = SolutionVerifier.from_sokoban(sokoban).verify(
+                    to_lurd(solver.initial_node.state, result.moves), strict=True)
+                self.assertTrue(verification.solved)
+                self.assertEqual((verification.moves, verification.pushes), (len(result.moves), result.pushes))
+
+
+if __name__ == "__main__":
+    unittest.main()
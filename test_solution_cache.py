@@ -0,0 +1,47 @@
+import tempfile
+import unittest
+
+from algorithms import SokobanSolver
+from sokoban import Sokoban
+from solution_cache import SolutionCache, solution_key
+
+DEADLOCKS = ("dead_squares", "freeze")
+
+
+class SolutionCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache = SolutionCache(directory.name)
+        self.sokoban = Sokoban(2, "levels.txt")
+
+    def _solve(self, algorithm_name, heuristic_name):
+        return SokobanSolver(self.sokoban, cache=self.cache).solve(algorithm_name, heuristic_name, mode="pushes")
+
+    def _entry(self, algorithm_name, heuristic_name):
+        return self.cache.get_solution(self.sokoban, solution_key(algorithm_name, heuristic_name, "pushes", True,
+                                                                  DEADLOCKS))
+
+    def test_round_trip_keeps_the_solution_and_optimal_flag(self):
+        first = self._solve("a_star", "matching")
+        again = self._solve("a_star", "matching")
+        self.assertFalse(first.cached)
+        self.assertTrue(again.cached)
+        self.assertEqual((again.moves, again.cost, again.nodes), (first.moves, first.cost, first.nodes))
+        self.assertEqual(self._entry("a_star", "matching")["optimal"], {"moves": False, "pushes": True})
+
+    def test_inadmissible_heuristic_is_not_optimal(self):
+        self._solve("a_star", "manhattan_player")
+        self.assertEqual(self._entry("a_star", "manhattan_player")["optimal"], {"moves": False, "pushes": False})
+
+    def test_uninformed_search_ignores_the_heuristic(self):
+        # bfs never calls manhattan_player, so its solution is stored under the heuristic-less key, as optimal
+        first = self._solve("bfs", "manhattan_player")
+        again = self._solve("bfs", None)
+        self.assertTrue(again.cached)
+        self.assertEqual(again.moves, first.moves)
+        self.assertEqual(self._entry("bfs", None)["optimal"], {"moves": False, "pushes": True})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import unittest
+
+from algorithms import SokobanSolver
+from lurd import to_lurd
+from sokoban import Sokoban
+from verifier import SolutionVerifier, verify_many
+
+
+class SolutionVerifierTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        sokoban = Sokoban(1, "levels.txt")
+        solver = SokobanSolver(sokoban)
+        result = solver.solve("a_star", "matching", mode="pushes")
+        cls.lurd = to_lurd(solver.initial_node.state, result.moves)
+        cls.pushes = result.pushes
+        cls.verifier = SolutionVerifier.from_sokoban(sokoban)
+
+    def test_accepts_a_solution(self):
+        for strict in [False, True]:
+            with self.subTest(strict=strict):
+                verification = self.verifier.verify(self.lurd, strict)
+                self.assertTrue(verification.solved)
+                self.assertEqual((verification.moves, verification.pushes), (len(self.lurd), self.pushes))
+
+    def test_rejects_a_truncated_solution(self):
+        verification = self.verifier.verify(self.lurd[:-1])
+        self.assertTrue(verification.valid)
+        self.assertFalse(verification.solved)
+        self.assertEqual(verification.error, "boxes left off goals")
+
+    def test_rejects_invalid_moves(self):
+        # The player starts two cells right of the level's left wall
+        self.assertEqual(self.verifier.verify("lll").error, "walk into a wall at 2")
+        self.assertEqual(self.verifier.verify("lx").error, "invalid character 'x' at 1")
+        self.assertFalse(self.verifier.verify("lll" + self.lurd).valid)
+
+    def test_strict_mode_checks_the_letter_case(self):
+        self.assertTrue(self.verifier.verify(self.lurd.lower()).solved)
+        self.assertFalse(self.verifier.verify(self.lurd.lower(), strict=True).valid)
+        self.assertFalse(self.verifier.verify(self.lurd.upper(), strict=True).valid)
+
+    def test_verify_many_matches_verify(self):
+        lurds = [self.lurd, self.lurd[:-1], "lll"]
+        verifications = verify_many([("levels.txt", 1, lurd) for lurd in lurds])
+        self.assertEqual([verification.to_dict() for verification in verifications],
+                         [self.verifier.verify(lurd).to_dict() for lurd in lurds])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+class TranspositionTable:
+    """Closed set shared by the graph searches, keyed on a state key function.
+
+    Remembers the best cost (depth) each key was reached with. A state whose key was
+    already reached at an equal or lower cost is a duplicate and is dropped; when
+    `reopen` is set a strictly cheaper path re-admits the key (needed by A*).
+    With `max_entries` the table stops remembering new keys once full, which only
+    costs pruning, never correctness.
+    """
+
+    def __init__(self, key_fn, enabled=True, reopen=False, max_entries=None):
+        self.key_fn = key_fn
+        self.enabled = enabled
+        self.reopen = reopen
+        self.max_entries = max_entries
+        self.best_cost = {}
+        self.generated = 0
+        self.duplicates = 0
+        self.reopened = 0
+
+    def __len__(self):
+        return len(self.best_cost)
+
+    def admit(self, state, cost) -> bool:
+        self.generated += 1
+        if not self.enabled:
+            return True
+        key = self.key_fn(state)
+        best = self.best_cost.get(key)
+        if best is not None and (not self.reopen or best <= cost):
+            self.duplicates += 1
+            return False
+        if best is not None:
+            self.reopened += 1
+        elif self.max_entries is not None and len(self.best_cost) >= self.max_entries:
+            return True
+        self.best_cost[key] = cost
+        return True
+
+    def clear(self):
+        self.best_cost.clear()
+
+    def is_stale(self, state, cost) -> bool:
+        # A queued node is stale once its key has been reached again more cheaply
+        if not self.enabled:
+            return False
+        return self.best_cost.get(self.key_fn(state), cost) < cost
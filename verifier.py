@@ -0,0 +1,172 @@
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bitboard import BitboardLevel
+from level_library import LevelLibrary
+
+_WALL = 0
+_FLOOR = 1
+_BOX = 2
+_LETTER_OFFSETS = {"l": (-1, 0), "r": (1, 0), "u": (0, -1), "d": (0, 1)}
+# Solutions handed to one pool task at a time
+VERIFY_CHUNK = 256
+
+
+class Verification:
+    """Outcome of replaying one LURD string.
+
+    valid means every move could be made (and, in strict mode, that every letter's case
+    matched whether it pushed a box); complete means the boxes all ended on goals.
+    error describes the first problem, with its position in the string.
+    """
+
+    def __init__(self, valid, complete, moves, pushes, error=None):
+        self.valid = valid
+        self.complete = complete
+        self.moves = moves
+        self.pushes = pushes
+        self.error = error
+
+    @property
+    def solved(self):
+        return self.valid and self.complete
+
+    def to_dict(self):
+        return {"valid": self.valid, "complete": self.complete, "moves": self.moves, "pushes": self.pushes,
+                "error": self.error}
+
+
+class SolutionVerifier:
+    """Replays LURD strings on one level, many times over.
+
+    The level is compiled once to a byte per cell in the BitboardLevel layout (index
+    y * stride + x) with a wall row above and below, so a move is one addition and a
+    couple of byte lookups on a copy of that array; nothing is drawn or allocated per move.
+    """
+
+    def __init__(self, board: BitboardLevel, player, boxes):
+        stride = board.stride
+        # The padding row on top shifts every index by one stride
+        self.cells = bytearray((board.height + 2) * stride)
+        for x, y in board.points_of(board.floor):
+            self.cells[(y + 1) * stride + x] = _FLOOR
+        for x, y in boxes:
+            self.cells[(y + 1) * stride + x] = _BOX
+        self.player = (player[1] + 1) * stride + player[0]
+        self.goals = [(y + 1) * stride + x for x, y in board.points_of(board.goals)]
+        self.box_count = len(boxes)
+        self.steps = {}
+        for letter, (x_diff, y_diff) in _LETTER_OFFSETS.items():
+            self.steps[letter] = self.steps[letter.upper()] = y_diff * stride + x_diff
+
+    @classmethod
+    def from_sokoban(cls, sokoban):
+        x, y, _ = sokoban.get_player()
+        return cls(sokoban.get_board(), (x, y), sokoban.get_boxes())
+
+    @classmethod
+    def from_parsed(cls, parsed):
+        return cls(parsed.board(), parsed.player, parsed.boxes)
+
+    def verify(self, lurd: str, strict=False) -> Verification:
+        cells = bytearray(self.cells)
+        steps = self.steps
+        player = self.player
+        moves = 0
+        pushes = 0
+        for position, letter in enumerate(lurd):
+            step = steps.get(letter)
+            if step is None:
+                if letter.isspace():
+                    continue
+                return Verification(False, False, moves, pushes, f"invalid character {letter!r} at {position}")
+            target = player + step
+            content = cells[target]
+            if content == _BOX:
+                beyond = target + step
+                if cells[beyond] != _FLOOR:
+                    return Verification(False, False, moves, pushes, f"blocked push at {position}")
+                if strict and letter.islower():
+                    return Verification(False, False, moves, pushes, f"push written as a walk at {position}")
+                cells[beyond] = _BOX
+                cells[target] = _FLOOR
+                pushes += 1
+            elif content == _WALL:
+                return Verification(False, False, moves, pushes, f"walk into a wall at {position}")
+            elif strict and letter.isupper():
+                return Verification(False, False, moves, pushes, f"walk written as a push at {position}")
+            player = target
+            moves += 1
+        on_goals = sum(1 for goal in self.goals if cells[goal] == _BOX)
+        complete = on_goals == self.box_count
+        return Verification(True, complete, moves, pushes, None if complete else "boxes left off goals")
+
+
+# Verifiers of the levels a pool worker has already seen
+_verifiers = {}
+
+
+def _verify_chunk(chunk, strict):
+    results = []
+    for levels_file, level, lurd in chunk:
+        key = (levels_file, level)
+        verifier = _verifiers.get(key)
+        if verifier is None:
+            verifier = _verifiers[key] = SolutionVerifier.from_parsed(LevelLibrary.shared(levels_file).get(level))
+        results.append(verifier.verify(lurd, strict))
+    return results
+
+
+def verify_many(jobs, workers=1, strict=False):
+    # jobs are (levels file, level, LURD string) tuples; returns one Verification per job, in order.
+    # Jobs of the same level are best kept together so each worker compiles few levels
+    jobs = list(jobs)
+    chunks = [jobs[start:start + VERIFY_CHUNK] for start in range(0, len(jobs), VERIFY_CHUNK)]
+    if workers <= 1:
+        return [verification for chunk in chunks for verification in _verify_chunk(chunk, strict)]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for verifications in executor.map(_verify_chunk, chunks, [strict] * len(chunks)):
+            results.extend(verifications)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify LURD solutions, e.g. the JSON lines of batch_solve.py")
+    parser.add_argument("inputs", nargs="+", help='JSON lines files with "level", "lurd" and optionally "file"')
+    parser.add_argument("--levels-file", default="levels.txt", help='levels file of records without a "file"')
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--strict", action="store_true", help="also require uppercase letters exactly for pushes")
+    args = parser.parse_args()
+
+    records = []
+    for path in args.inputs:
+        with open(path) as file:
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("lurd"):
+                        records.append(record)
+    jobs = [(record.get("file", args.levels_file), record["level"], record["lurd"]) for record in records]
+    start = time.perf_counter()
+    try:
+        verifications = verify_many(jobs, args.workers, args.strict)
+    except RuntimeError as error:
+        parser.error(str(error))
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for (levels_file, level, _), verification in zip(jobs, verifications):
+        print(json.dumps({"file": levels_file, "level": level, **verification.to_dict()}))
+        failed += not verification.solved
+    rate = len(jobs) / elapsed if elapsed else 0.0
+    print(f"Verified {len(jobs)} solutions in {elapsed:.2f}s ({rate:.0f}/s), {failed} failed", file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()